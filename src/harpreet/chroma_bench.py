@@ -0,0 +1,145 @@
+import chromadb
+import csv
+import itertools
+import json
+import sys
+import time
+import numpy as np
+from harpreet.chroma_ex import HNSW_SETTINGS
+
+# HNSW settings compared by default; each dict overrides HNSW_SETTINGS
+PARAMETER_GRID = [
+    {"hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef}
+    for m, construction_ef, search_ef in itertools.product([16, 32], [100, 200], [10, 50, 100])
+]
+
+# Queries per collection.query call
+BATCH_SIZES = [1, 16, 64]
+
+# Vectors added per upsert while building an index
+BUILD_BATCH = 5_000
+
+
+def synthetic_corpus(n_vectors=20_000, dim=384, n_queries=500, clusters=50, seed=0):
+    """(corpus, queries): float32 vectors drawn around random cluster centres.
+
+    Clustered data is harder for an approximate index than uniform noise and
+    closer to real embeddings; queries come from the same distribution.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        return centres[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+    return sample(n_vectors), sample(n_queries)
+
+
+def load_corpus(path, n_queries=500, seed=0):
+    """(corpus, queries) from an .npy file of vectors, holding out n_queries of them as queries"""
+    vectors = np.load(path).astype(np.float32)
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[n_queries:]], vectors[order[:n_queries]]
+
+
+def exact_neighbours(corpus, queries, k, space="cosine", chunk=1024):
+    """(n_queries, k) indexes of the true k nearest corpus vectors, by brute force"""
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    squared_norms = (corpus ** 2).sum(axis=1)
+    neighbours = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), chunk):
+        scores = queries[start:start + chunk] @ corpus.T
+        if space == "l2":
+            scores = 2 * scores - squared_norms  # -|q - x|^2 up to a per-query constant
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        neighbours[start:start + chunk] = np.take_along_axis(top, order, axis=1)
+    return neighbours
+
+
+def recall(found, truth):
+    """Mean fraction of the true neighbours that were found"""
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def build_collection(client, corpus, hnsw, name="bench"):
+    """A fresh collection holding corpus, with ids "0".."n-1", and its build time in seconds"""
+    # list_collections() returns names on chromadb 0.6 and Collection objects on 1.x
+    if name in [getattr(collection, "name", collection) for collection in client.list_collections()]:
+        client.delete_collection(name)
+    collection = client.create_collection(name=name, metadata={**HNSW_SETTINGS, **hnsw},
+                                          embedding_function=None)
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), BUILD_BATCH):
+        chunk = corpus[offset:offset + BUILD_BATCH]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(chunk))], embeddings=chunk)
+    return collection, time.perf_counter() - start
+
+
+def measure(collection, queries, truth, k, batch_size):
+    """Recall@k, QPS and per-call latency percentiles for one batch size"""
+    latencies = []
+    found = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        call_start = time.perf_counter()
+        result = collection.query(query_embeddings=queries[offset:offset + batch_size],
+                                  n_results=k, include=[])
+        latencies.append(time.perf_counter() - call_start)
+        found.extend([int(i) for i in ids] for ids in result["ids"])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        f"recall@{k}": round(recall(found, truth), 4),
+        "qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def run_benchmark(corpus, queries, k=10, grid=PARAMETER_GRID, batch_sizes=BATCH_SIZES, client=None):
+    """One result row per (HNSW settings, batch size)"""
+    client = client or chromadb.EphemeralClient()
+    space = HNSW_SETTINGS["hnsw:space"]
+    start = time.perf_counter()
+    truth = exact_neighbours(corpus, queries, k, space)
+    print(f"Exact {k}-NN of {len(queries)} queries over {len(corpus)} vectors in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    rows = []
+    for hnsw in grid:
+        collection, build_seconds = build_collection(client, corpus, hnsw)
+        for batch_size in batch_sizes:
+            row = {"M": hnsw.get("hnsw:M", HNSW_SETTINGS["hnsw:M"]),
+                   "construction_ef": hnsw.get("hnsw:construction_ef", HNSW_SETTINGS["hnsw:construction_ef"]),
+                   "search_ef": hnsw.get("hnsw:search_ef", HNSW_SETTINGS["hnsw:search_ef"]),
+                   "batch_size": batch_size,
+                   "build_s": round(build_seconds, 2),
+                   **measure(collection, queries, truth, k, batch_size)}
+            print(row)
+            rows.append(row)
+        client.delete_collection(collection.name)
+    return rows
+
+
+def write_results(rows, path):
+    """Save result rows as CSV or, for a .json path, JSON"""
+    if str(path).endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    # python chroma_bench.py [n_vectors | vectors.npy] [results.csv | results.json]
+    source = sys.argv[1] if len(sys.argv) > 1 else "20000"
+    output = sys.argv[2] if len(sys.argv) > 2 else "chroma_bench.csv"
+    corpus, queries = load_corpus(source) if source.endswith(".npy") else synthetic_corpus(int(source))
+    write_results(run_benchmark(corpus, queries), output)
+    print(f"Results written to {output}")
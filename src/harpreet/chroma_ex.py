@@ -1,26 +1,447 @@
 import chromadb
+import hashlib
+import json
+import os
 import pprint
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import batched
+from pathlib import Path
+import numpy as np
+from chromadb.utils import embedding_functions
 
-print = pprint.pprint
+COLLECTION = "my_collection"
 
-chroma_client = chromadb.Client()
+# On-disk home of the persistent client; None means an in-memory client
+CHROMA_PATH = "chroma_data"
 
-collection = chroma_client.get_or_create_collection(name="my_collection")
+# HNSW index settings, fixed when a collection is created. search_ef trades
+# query latency for recall; construction_ef and M do the same for build time
+# and memory. hnsw:space is one of "l2", "cosine" or "ip".
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 100,
+    "hnsw:M": 16,
+}
 
-collection.upsert(
-    documents=[
-        "a guide to touring vineyards in france",
-        "a book on portugal",
-        "visit russia",
-        "see penguins",
-        "in mexico they speak spanish"
-    ],
-    ids=["id1", "id2", "id3", "id4", "id5"]
-)
+# Local store of document embeddings, so unchanged documents are never re-embedded
+EMBEDDING_CACHE = "chroma_embeddings"
 
-results = collection.query(
-    query_texts=["who wears a sombrero"],
-    n_results=2
-)
+# Documents embedded and upserted per call
+DEFAULT_BATCH_SIZE = 256
 
-print(results)
+# Threads computing embeddings while the main thread upserts
+DEFAULT_EMBED_WORKERS = 4
+
+# Query results kept by SearchService, and for how many seconds
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 300.0
+
+# Concurrent queries SearchService folds into one collection.query call, and
+# how long it waits for more to arrive once the first one is queued
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT = 0.005
+
+DOCUMENTS = [
+    "a guide to touring vineyards in france",
+    "a book on portugal",
+    "visit russia",
+    "see penguins",
+    "in mexico they speak spanish"
+]
+
+
+def content_hash(document):
+    """SHA-256 of a document's text, the key of its embedding"""
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings on disk in a NumPy memmap, one float32 row per content hash.
+
+    vectors.f32 holds the rows back to back, index.log has one "hash row"
+    line per cached vector and meta.json records the dimension. Both files
+    are only ever appended to, so a lookup is a dict access plus a memmap
+    slice and a put costs the same however large the cache grows. Row
+    numbers come from the size of vectors.f32 at the time of writing, so
+    vectors left behind by a crashed run, or appended by another process
+    since this one opened the cache, are never read for the wrong hash.
+    Keep one directory per embedding model: vectors from different models
+    don't mix.
+    """
+
+    def __init__(self, directory=EMBEDDING_CACHE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / "vectors.f32"
+        self._index_path = self.directory / "index.log"
+        self._meta_path = self.directory / "meta.json"
+        self.dim = json.loads(self._meta_path.read_text())["dim"] if self._meta_path.exists() else None
+        self._rows = self._read_index()
+        self._vectors = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, digest):
+        return digest in self._rows
+
+    def get(self, digests):
+        """(n, dim) array of cached vectors for the given hashes, all of which must be cached"""
+        with self._lock:
+            vectors = self._open()
+            return np.array(vectors[[self._rows[digest] for digest in digests]])
+
+    def put(self, digests, vectors):
+        """Append vectors for hashes that are not cached yet"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._meta_path.write_text(json.dumps({"dim": self.dim}))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self._rows:
+                    new.setdefault(digest, vector)
+            if not new:
+                return
+            row_bytes = self.dim * np.dtype(np.float32).itemsize
+            with open(self._vectors_path, "ab") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size % row_bytes:
+                    # A partial row from an interrupted write; overwrite it
+                    size = f.truncate(size - size % row_bytes)
+                first = size // row_bytes
+                f.write(np.stack(list(new.values())).tobytes())
+            rows = {digest: first + i for i, digest in enumerate(new)}
+            with open(self._index_path, "a") as f:
+                f.writelines(f"{digest} {row}\n" for digest, row in rows.items())
+            self._rows.update(rows)
+            self._vectors = None
+
+    def _open(self):
+        """Memmap of every complete row in vectors.f32; call with the lock held"""
+        if self._vectors is None:
+            rows = self._vectors_path.stat().st_size // (self.dim * np.dtype(np.float32).itemsize)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def _read_index(self):
+        """{hash: row} from index.log, ignoring a last line cut short by a crash"""
+        rows = {}
+        if self._index_path.exists():
+            with open(self._index_path) as f:
+                for line in f:
+                    digest, _, row = line.partition(" ")
+                    if line.endswith("\n") and row.strip().isdigit():
+                        rows[digest] = int(row)
+        return rows
+
+
+def iter_documents(source):
+    """Yield (id, document, metadata) from a file or an iterable.
+
+    A .jsonl file holds one {"id", "document", "metadata"} object per line;
+    any other file is read as one document per line. An iterable may yield
+    strings, (id, document) pairs or dicts like the .jsonl lines. Documents
+    without an id are keyed on their content hash.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding="utf-8") as f:
+            if str(source).endswith(".jsonl"):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = (line.rstrip("\n") for line in f if line.strip())
+            yield from iter_documents(records)
+        return
+
+    for record in source:
+        if isinstance(record, str):
+            doc_id, document, metadata = None, record, None
+        elif isinstance(record, dict):
+            doc_id, document, metadata = record.get("id"), record["document"], record.get("metadata")
+        else:
+            doc_id, document = record
+            metadata = None
+        yield doc_id or content_hash(document), document, metadata
+
+
+class Ingester:
+    """Streams documents into a collection in batches, embedding each distinct text once.
+
+    Every document is stored with its content hash in its metadata. Per
+    batch, documents whose id already holds the same hash are skipped
+    outright; the rest take their vectors from the EmbeddingCache, and only
+    cache misses are sent to the embedding function, on a worker pool, so
+    the next batches are being embedded while this one is upserted.
+    """
+
+    def __init__(self, collection, embedding_function, cache=None,
+                 batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_EMBED_WORKERS, on_change=None):
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.batch_size = batch_size
+        self.workers = workers
+        self.on_change = on_change  # called after every upsert, e.g. SearchService.invalidate
+
+    def ingest(self, source):
+        """Upsert every document from source (see iter_documents) and return counts"""
+        stats = {"documents": 0, "unchanged": 0, "embedded": 0, "cached": 0, "upserted": 0}
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed") as pool:
+            for batch in batched(iter_documents(source), self.batch_size):
+                stats["documents"] += len(batch)
+                batch = self._changed(batch, stats)
+                if batch:
+                    pending.append((batch, self._submit(pool, batch, stats)))
+                # Bound the documents held in memory while embeddings run ahead
+                while len(pending) > 2 * self.workers:
+                    self._upsert(*pending.popleft(), stats)
+            while pending:
+                self._upsert(*pending.popleft(), stats)
+        print(f"Ingested {stats['documents']} documents into {self.collection.name}: "
+              f"{stats['upserted']} upserted, {stats['unchanged']} unchanged, "
+              f"{stats['embedded']} embedded, {stats['cached']} from cache")
+        return stats
+
+    def _changed(self, batch, stats):
+        """The documents of batch whose id does not already hold the same content"""
+        batch = list({record[0]: record for record in batch}.values())  # last one wins per id
+        ids = [doc_id for doc_id, _, _ in batch]
+        stored = self.collection.get(ids=ids, include=["metadatas"])
+        hashes = {doc_id: (metadata or {}).get("content_hash")
+                  for doc_id, metadata in zip(stored["ids"], stored["metadatas"])}
+        changed = [record for record in batch if hashes.get(record[0]) != content_hash(record[1])]
+        stats["unchanged"] += len(batch) - len(changed)
+        return changed
+
+    def _submit(self, pool, batch, stats):
+        """Future of the embeddings of this batch's cache misses"""
+        missing = {}
+        for _, document, _ in batch:
+            digest = content_hash(document)
+            if digest not in self.cache:
+                missing.setdefault(digest, document)
+        stats["embedded"] += len(missing)
+        stats["cached"] += len(batch) - len(missing)
+        return pool.submit(self._embed, list(missing), list(missing.values()))
+
+    def _embed(self, digests, documents):
+        if documents:
+            self.cache.put(digests, self.embedding_function(documents))
+
+    def _upsert(self, batch, future, stats):
+        future.result()
+        ids, documents, metadatas = zip(*batch)
+        digests = [content_hash(document) for document in documents]
+        self.collection.upsert(
+            ids=list(ids),
+            documents=list(documents),
+            embeddings=self.cache.get(digests),
+            metadatas=[{**(metadata or {}), "content_hash": digest}
+                       for metadata, digest in zip(metadatas, digests)])
+        stats["upserted"] += len(batch)
+        if self.on_change:
+            self.on_change()
+
+
+class SearchService:
+    """Similarity search over a collection with a result cache and query batching.
+
+    Results are cached per (normalised query text, n_results, where filter)
+    for up to ttl seconds, least recently used first out. Cache misses are
+    queued: a background thread waits max_wait seconds for more to arrive
+    and answers up to max_batch of them with a single collection.query call,
+    so a burst of concurrent searches costs one embedding batch and one
+    index pass, and identical searches in flight share one result. Writes
+    through upsert()/delete() clear the cache; anything else that changes
+    the collection should call invalidate().
+    """
+
+    def __init__(self, collection, cache_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL,
+                 max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        self.collection = collection
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="chroma-search", daemon=True)
+        self._worker.start()
+
+    def query(self, text, n_results=2, where=None):
+        """Nearest documents to text, as a query() result for that single text"""
+        return self.submit(text, n_results, where).result()
+
+    def query_many(self, texts, n_results=2, where=None):
+        """Results for several texts, answered together"""
+        return [future.result() for future in [self.submit(text, n_results, where) for text in texts]]
+
+    def submit(self, text, n_results=2, where=None):
+        """Future of the result for text, served from the cache when possible"""
+        key = (normalise_query(text), n_results, json.dumps(where, sort_keys=True))
+        future = Future()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                future.set_result(entry[1])
+                return future
+            # Join an identical query that is already queued or running
+            if key in self._inflight:
+                self.hits += 1
+                return self._inflight[key]
+            self.misses += 1
+            self._inflight[key] = future
+            generation = self._generation
+        self._queue.put((key, where, generation, future))
+        return future
+
+    def upsert(self, **kwargs):
+        self.collection.upsert(**kwargs)
+        self.invalidate()
+
+    def delete(self, **kwargs):
+        self.collection.delete(**kwargs)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop every cached result, including those of queries still in flight"""
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+            self._inflight.clear()
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while (request := self._queue.get()) is not None:
+            requests = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(requests) < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                requests.append(request)
+
+            # One query call per (n_results, where), each text searched once
+            groups = {}
+            for request in requests:
+                key = request[0]
+                groups.setdefault(key[1:], {}).setdefault(key, []).append(request)
+            for (n_results, _), by_key in groups.items():
+                self._answer(n_results, by_key)
+
+    def _answer(self, n_results, by_key):
+        keys = list(by_key)
+        where = by_key[keys[0]][0][1]
+        try:
+            results = self.collection.query(query_texts=[key[0] for key in keys],
+                                            n_results=n_results, where=where)
+        except Exception as e:
+            with self._lock:
+                for key, requests in by_key.items():
+                    for _, _, _, future in requests:
+                        if self._inflight.get(key) is future:
+                            del self._inflight[key]
+            for requests in by_key.values():
+                for _, _, _, future in requests:
+                    future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        for i, key in enumerate(keys):
+            result = {field: values if field == "included" or values is None else values[i:i + 1]
+                      for field, values in results.items()}
+            with self._lock:
+                for _, _, generation, future in by_key[key]:
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    # Only cache results that no write has overtaken
+                    if generation == self._generation:
+                        self._cache[key] = (now + self.ttl, result)
+                        self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for _, _, _, future in by_key[key]:
+                future.set_result(result)
+
+
+def normalise_query(text):
+    """Query text with case and whitespace differences removed, the form that is embedded and cached"""
+    return " ".join(text.casefold().split())
+
+
+def make_client(path=CHROMA_PATH):
+    """A PersistentClient storing its collections and HNSW indexes under path.
+
+    A client opened on an existing path loads the indexes from disk instead
+    of rebuilding them. path=None gives the in-memory client.
+    """
+    if path is None:
+        return chromadb.Client()
+    return chromadb.PersistentClient(path=str(path))
+
+
+def get_collection(client, name=COLLECTION, embedding_function=None, hnsw=None):
+    """The named collection, created on first use with the given HNSW settings.
+
+    hnsw overrides HNSW_SETTINGS key by key. It only applies when the
+    collection is created: an existing collection keeps the settings it was
+    built with.
+    """
+    embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+    return client.get_or_create_collection(name=name, embedding_function=embedding_function,
+                                           metadata={**HNSW_SETTINGS, **(hnsw or {})})
+
+
+def warm_start(client, source, name=COLLECTION, embedding_function=None, hnsw=None):
+    """The collection, ingesting source only if the collection is empty.
+
+    On a persistent client that already holds the collection this is just an
+    open, so startup time does not grow with the corpus. Use an Ingester to
+    bring an existing collection up to date.
+    """
+    embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+    collection = get_collection(client, name, embedding_function, hnsw)
+    count = collection.count()
+    if count:
+        print(f"Opened {name} with {count} documents")
+    else:
+        Ingester(collection, embedding_function).ingest(source)
+    return collection
+
+
+if __name__ == "__main__":
+    embedding_function = embedding_functions.DefaultEmbeddingFunction()
+    chroma_client = make_client()
+    collection = warm_start(chroma_client, zip(["id1", "id2", "id3", "id4", "id5"], DOCUMENTS),
+                            embedding_function=embedding_function)
+
+    search = SearchService(collection)
+    results = search.query("who wears a sombrero", n_results=2)
+    pprint.pprint(results)
+
+    search.query_many(["Who wears a  sombrero", "penguins", "wine"], n_results=2)
+    print(f"{search.hits} cache hits, {search.misses} misses")
+    search.close()
@@ -1,27 +1,311 @@
 import duckdb
+import glob
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+
 DATA = "/Users/andy/data/duckdb/brie"
-population = duckdb.read_csv(DATA + "/world_population.csv")
-print(population.describe())
-print(population.columns)
-print(population.dtypes)
-print(type(population))
-
-con = duckdb.connect()
-con.execute(
-    f"CREATE TABLE population AS SELECT * FROM read_csv_auto('{DATA}/world_population.csv')")
-
-result = con.execute("SELECT * FROM population").fetchall()
-
-print(result)
-con.execute(
-    f"""drop 
-            table if exists 
-        population; 
-        
-        CREATE 
-        TABLE population AS 
-        SELECT 
-            * 
-        FROM read_csv_auto('{DATA}/world_population.csv')
-"""
-)
+CACHE = DATA + "/parquet_cache"
+DATABASE = DATA + "/population.duckdb"
+
+# Column types of world_population.csv (Kaggle layout), so DuckDB never has to sniff it
+WORLD_POPULATION_SCHEMA = {
+    "Rank": "BIGINT",
+    "CCA3": "VARCHAR",
+    "Country/Territory": "VARCHAR",
+    "Capital": "VARCHAR",
+    "Continent": "VARCHAR",
+    "2022 Population": "BIGINT",
+    "2020 Population": "BIGINT",
+    "2015 Population": "BIGINT",
+    "2010 Population": "BIGINT",
+    "2000 Population": "BIGINT",
+    "1990 Population": "BIGINT",
+    "1980 Population": "BIGINT",
+    "1970 Population": "BIGINT",
+    "Area (km²)": "DOUBLE",
+    "Density (per km²)": "DOUBLE",
+    "Growth Rate": "DOUBLE",
+    "World Population Percentage": "DOUBLE",
+}
+
+# Rows per Arrow record batch when streaming query results
+DEFAULT_BATCH_ROWS = 100_000
+
+# Bytes read at a time when hashing source files
+HASH_CHUNK = 8 * 1024 * 1024
+
+
+class ConnectionManager:
+    """One DuckDB database shared by a pool of reader threads and a single writer.
+
+    Each reader thread gets its own cursor (a DuckDB connection to the same
+    database), so analytical queries run in parallel; writes go through
+    writer(), which serializes them. database is a file path for a
+    persistent, warm database or ":memory:"; threads and memory_limit
+    (e.g. "8GB") are passed to DuckDB as-is.
+    """
+
+    def __init__(self, database=":memory:", threads=None, memory_limit=None,
+                 read_workers=4, read_only=False):
+        config = {key: value for key, value in
+                  (("threads", threads), ("memory_limit", memory_limit)) if value is not None}
+        self.con = duckdb.connect(database, read_only=read_only, config=config)
+        self._local = threading.local()
+        self._cursors = []
+        self._cursors_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="duck-read")
+
+    def cursor(self):
+        """The calling thread's cursor, created on first use"""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.con.cursor()
+            self._local.cursor = cursor
+            with self._cursors_lock:
+                self._cursors.append(cursor)
+        return cursor
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the connection for writes"""
+        with self._write_lock:
+            yield self.con
+
+    def read(self, query, params=None):
+        """Run a read query on the calling thread's cursor and return a pyarrow Table"""
+        return self.cursor().execute(query, params or []).fetch_arrow_table()
+
+    def submit(self, query, params=None):
+        """Run a read query on the reader pool and return its Future"""
+        return self._pool.submit(self.read, query, params)
+
+    def read_many(self, queries):
+        """Run several read queries concurrently and return their tables in order"""
+        return [future.result() for future in [self.submit(query) for query in queries]]
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._cursors_lock:
+            for cursor in self._cursors:
+                cursor.close()
+            self._cursors.clear()
+        self.con.close()
+
+
+class DuckLoader:
+    """Incremental CSV loader that parses each source file at most once.
+
+    Every CSV is converted to Parquet with DuckDB's parallel CSV reader and
+    kept in cache_dir, keyed on the file's mtime, size and SHA-256, so a
+    re-run reads Parquet instead of re-parsing. Tables are appended to and
+    only dropped when ingest() is asked to replace a changed file: the
+    _ingested_files table records which files each table already holds and
+    ingest() only loads the new ones. Pass a
+    ConnectionManager over a database file to keep the loaded tables
+    between runs.
+    """
+
+    def __init__(self, db=None, cache_dir=CACHE):
+        self.db = db or ConnectionManager()
+        self.con = self.db.con
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.cache_dir / "index.json"
+        self._index = json.loads(self._index_path.read_text()) if self._index_path.exists() else {}
+        with self.db.writer() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS _ingested_files (
+                    table_name VARCHAR,
+                    path VARCHAR,
+                    sha256 VARCHAR,
+                    loaded_at TIMESTAMP DEFAULT current_timestamp
+                )
+            """)
+
+    def ingest(self, pattern, table, schema=None, replace=False):
+        """Append every file matching the glob pattern that table does not hold yet.
+
+        schema maps column names to DuckDB types; without it the reader
+        auto-detects them. A file that changed since it was loaded cannot be
+        swapped out on its own, because rows do not record their source
+        file. By default that raises ValueError naming the changed files,
+        before anything is loaded; with replace the table is rebuilt from
+        every file matching pattern instead. Everything commits in one
+        transaction. Returns the number of files loaded.
+        """
+        files = [(path, *self.cached_parquet(path, schema))
+                 for path in map(os.path.abspath, sorted(glob.glob(pattern)))]
+        with self.db.writer() as con:
+            loaded = {}
+            for path, sha256 in con.execute(
+                    "SELECT path, sha256 FROM _ingested_files WHERE table_name = ?", [table]).fetchall():
+                loaded.setdefault(path, set()).add(sha256)
+            stale = [path for path, digest, _ in files if path in loaded and digest not in loaded[path]]
+            if stale and not replace:
+                raise ValueError(f"{len(stale)} file(s) changed since they were loaded into {table}: "
+                                 f"{', '.join(stale)}; pass replace=True to rebuild the table")
+            if not stale:
+                files = [file for file in files if file[0] not in loaded]
+
+            # The rows and their manifest entries commit together, so a crash
+            # in between cannot leave a file loaded but unrecorded
+            con.execute("BEGIN TRANSACTION")
+            try:
+                if stale:
+                    con.execute(f"DROP TABLE IF EXISTS {_quote_identifier(table)}")
+                    con.execute("DELETE FROM _ingested_files WHERE table_name = ?", [table])
+                for path, digest, parquet in files:
+                    if self._table_exists(table, con):
+                        con.execute(f"INSERT INTO {_quote_identifier(table)} SELECT * FROM read_parquet({_quote(parquet)})")
+                    else:
+                        con.execute(f"CREATE TABLE {_quote_identifier(table)} AS SELECT * FROM read_parquet({_quote(parquet)})")
+                    con.execute(
+                        "INSERT INTO _ingested_files (table_name, path, sha256) VALUES (?, ?, ?)",
+                        [table, path, digest])
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        if stale:
+            print(f"Rebuilt {table}: {', '.join(stale)} changed since they were loaded")
+        for path, _, _ in files:
+            print(f"Loaded {path} into {table}")
+        return len(files)
+
+    def cached_parquet(self, path, schema=None):
+        """Return (sha256, Parquet path) for a CSV, converting it only if it is not cached.
+
+        The file is only re-hashed when its mtime or size changed, and only
+        re-parsed when its content hash (or the schema) changed.
+        """
+        stat = os.stat(path)
+        tag = hashlib.sha256(json.dumps(schema).encode()).hexdigest()[:8]
+        key = f"{path}|{tag}"
+        entry = self._index.get(key)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size \
+                and os.path.exists(entry["parquet"]):
+            return entry["sha256"], entry["parquet"]
+
+        digest = _file_digest(path)
+        parquet = str(self.cache_dir / f"{Path(path).stem}-{digest[:16]}-{tag}.parquet")
+        if not os.path.exists(parquet):
+            tmp = parquet + ".tmp"
+            self.db.cursor().execute(
+                f"COPY (SELECT * FROM {_read_csv_sql(path, schema)}) "
+                f"TO {_quote(tmp)} (FORMAT parquet, COMPRESSION zstd)")
+            os.replace(tmp, parquet)
+
+        self._index[key] = {"mtime": stat.st_mtime, "size": stat.st_size,
+                             "sha256": digest, "parquet": parquet}
+        self._index_path.write_text(json.dumps(self._index, indent=2))
+        return digest, parquet
+
+    def stream_batches(self, query, batch_size=DEFAULT_BATCH_ROWS, params=None):
+        """Yield the result of query as pyarrow RecordBatches of at most batch_size rows.
+
+        Only one batch is materialised at a time, so memory stays flat however
+        large the result is. Each call runs on its own cursor, so several
+        streams can be open at once.
+        """
+        cursor = self.con.cursor()
+        try:
+            yield from cursor.execute(query, params or []).fetch_record_batch(batch_size)
+        finally:
+            cursor.close()
+
+    def stream_pandas(self, query, batch_size=DEFAULT_BATCH_ROWS, params=None, arrow_dtypes=True):
+        """Yield the result of query as pandas DataFrames of at most batch_size rows.
+
+        With arrow_dtypes the frames are backed by the Arrow buffers
+        (pd.ArrowDtype columns) instead of being copied into NumPy/object
+        columns. Spark's Arrow-enabled createDataFrame accepts them directly.
+        """
+        types_mapper = pd.ArrowDtype if arrow_dtypes else None
+        for batch in self.stream_batches(query, batch_size, params):
+            yield batch.to_pandas(types_mapper=types_mapper)
+
+    def stream_numpy(self, query, batch_size=DEFAULT_BATCH_ROWS, params=None):
+        """Yield the result of query as {column: NumPy array} chunks of at most batch_size rows.
+
+        Numeric columns without nulls are zero-copy views of the Arrow buffers;
+        text columns (e.g. documents for a Chroma upsert) become object arrays.
+        """
+        for batch in self.stream_batches(query, batch_size, params):
+            yield {name: column.to_numpy(zero_copy_only=False)
+                   for name, column in zip(batch.schema.names, batch.columns)}
+
+    def to_arrow(self, query, params=None):
+        """Whole result of query as one pyarrow Table, for consumers that need it all at once"""
+        cursor = self.con.cursor()
+        try:
+            return cursor.execute(query, params or []).fetch_arrow_table()
+        finally:
+            cursor.close()
+
+    def _table_exists(self, table, con=None):
+        return bool((con or self.db.cursor()).execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?",
+            [table]).fetchone()[0])
+
+
+def _file_digest(path):
+    """SHA-256 of a file, read in HASH_CHUNK pieces"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _quote(value):
+    """SQL string literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _quote_identifier(name):
+    """SQL quoted identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _read_csv_sql(path, schema=None):
+    """read_csv(...) call for one file, with explicit column types when a schema is given"""
+    if schema is None:
+        return f"read_csv({_quote(path)}, header = true, auto_detect = true, parallel = true)"
+    columns = ", ".join(f"{_quote(name)}: {_quote(type_)}" for name, type_ in schema.items())
+    return f"read_csv({_quote(path)}, header = true, columns = {{{columns}}}, parallel = true)"
+
+
+if __name__ == "__main__":
+    db = ConnectionManager(DATABASE, threads=os.cpu_count(), memory_limit="4GB")
+    loader = DuckLoader(db)
+    loader.ingest(DATA + "/world_population*.csv", "population", WORLD_POPULATION_SCHEMA)
+
+    population = loader.con.table("population")
+    print(population.describe())
+    print(population.columns)
+    print(population.dtypes)
+    print(type(population))
+
+    rows = 0
+    for batch in loader.stream_batches("SELECT * FROM population"):
+        rows += batch.num_rows
+    print(f"Streamed {rows} rows")
+
+    print(next(loader.stream_pandas("SELECT * FROM population", batch_size=10)))
+
+    # Dashboard-style queries served in parallel from the warm database file
+    for table in db.read_many([
+        "SELECT Continent, sum(\"2022 Population\") AS population FROM population GROUP BY ALL ORDER BY 2 DESC",
+        "SELECT \"Country/Territory\", \"Growth Rate\" FROM population ORDER BY 2 DESC LIMIT 10",
+        "SELECT count(*) AS countries FROM population",
+    ]):
+        print(table.to_pandas())
+
+    db.close()
@@ -0,0 +1,98 @@
+import pprint
+import sys
+import uuid
+from harpreet.mongo_ex import connect
+
+# Lower bounds of the age brackets; the last bracket is open-ended
+AGE_BRACKETS = [0, 18, 30, 40, 50, 65]
+
+
+def _aggregate(collection, pipeline):
+    """Run a pipeline on the server; stages may spill to disk instead of failing on the 100MB limit"""
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+def _age_bracket_stages(brackets=AGE_BRACKETS):
+    return [{"$bucket": {
+        "groupBy": "$age",
+        "boundaries": brackets + [float("inf")],
+        "default": "unknown",
+        "output": {"users": {"$sum": 1}, "average_age": {"$avg": "$age"}},
+    }}]
+
+
+def _interest_stages(limit=None):
+    stages = [
+        {"$unwind": "$interests"},
+        {"$group": {"_id": "$interests", "users": {"$sum": 1}}},
+        {"$sort": {"users": -1, "_id": 1}},
+    ]
+    return stages + [{"$limit": limit}] if limit else stages
+
+
+def count_users(collection, query=None, exact=False):
+    """Number of users matching query.
+
+    Without a query (and unless exact is set) this reads the collection's
+    metadata via estimated_document_count, which is constant time; the
+    exact count has to walk an index or the whole collection.
+    """
+    if query or exact:
+        return collection.count_documents(query or {})
+    return collection.estimated_document_count()
+
+
+def users_by_age(collection, query=None, brackets=AGE_BRACKETS):
+    """[{"_id": bracket lower bound, "users", "average_age"}] for the users matching query"""
+    return _aggregate(collection, [{"$match": query or {}}] + _age_bracket_stages(brackets))
+
+
+def interest_popularity(collection, query=None, limit=10):
+    """The limit most common interests among users matching query, as [{"_id": interest, "users"}]"""
+    return _aggregate(collection, [{"$match": query or {}}] + _interest_stages(limit))
+
+
+def user_summary(collection, query=None, limit=10):
+    """Age brackets, top interests and total users for query, computed in one pass with $facet"""
+    (summary,) = _aggregate(collection, [
+        {"$match": query or {}},
+        {"$facet": {
+            "by_age": _age_bracket_stages(),
+            "top_interests": _interest_stages(limit),
+            "total": [{"$count": "users"}],
+        }},
+    ])
+    summary["total"] = summary["total"][0]["users"] if summary["total"] else 0
+    return summary
+
+
+def refresh_interest_counts(collection, target="interest_counts"):
+    """Recompute the interest counts into the target collection with $merge.
+
+    Readers query target, a small precomputed view, instead of aggregating
+    users. Each refresh tags its rows, and rows left over from interests
+    that no longer exist are removed afterwards.
+    """
+    refresh = uuid.uuid4().hex
+    _aggregate(collection, _interest_stages() + [
+        {"$set": {"refresh": refresh}},
+        {"$merge": {"into": target, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+    view = collection.database[target]
+    view.delete_many({"refresh": {"$ne": refresh}})
+    print(f"Refreshed {target}: {view.estimated_document_count()} interests")
+    return view
+
+
+if __name__ == "__main__":
+    client = connect()
+    users = client['example_database']['users']
+
+    print(f"About {count_users(users)} users, {count_users(users, {'age': {'$gt': 30}})} over 30")
+    pprint.pprint(users_by_age(users))
+    pprint.pprint(interest_popularity(users))
+    pprint.pprint(user_summary(users))
+    if len(sys.argv) > 1 and sys.argv[1] == "refresh":
+        refresh_interest_counts(users)
+
+    client.close()
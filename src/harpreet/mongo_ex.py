@@ -1,121 +1,367 @@
 # Import the PyMongo library
-from pymongo import MongoClient
+from pymongo import ASCENDING, AsyncMongoClient, IndexModel, MongoClient
+from pymongo.errors import ConnectionFailure, OperationFailure
+import asyncio
 import pprint
+import random
 import sys
 import time
 
 # Initialize the pretty printer
 pp = pprint.PrettyPrinter(indent=4)
 
-# Try to connect to MongoDB with retry logic
-max_retries = 3
-retry_delay = 2
 connection_string = 'mongodb://localhost:27017/'  # Use the port you mapped when starting the container
 
-for attempt in range(max_retries):
+# Connection pool settings for every client. Each client keeps up to
+# maxPoolSize sockets per server, holds minPoolSize of them open, closes ones
+# idle for maxIdleTimeMS, and makes an operation wait at most
+# waitQueueTimeoutMS for a free socket before failing.
+POOL_OPTIONS = {
+    "maxPoolSize": 100,
+    "minPoolSize": 10,
+    "maxIdleTimeMS": 60_000,
+    "waitQueueTimeoutMS": 5_000,
+    "serverSelectionTimeoutMS": 5_000,
+}
+
+# Readiness checks: attempts, and the first and longest wait between them
+READY_ATTEMPTS = 6
+READY_BASE_DELAY = 0.5
+READY_MAX_DELAY = 8.0
+
+_client = None
+
+# Indexes behind the users collection's access patterns, as (keys, options)
+USER_INDEXES = [
+    ([("name", ASCENDING)], {"name": "name_unique", "unique": True}),
+    ([("age", ASCENDING)], {"name": "age"}),
+    # interests is an array, so this index is multikey: one entry per interest
+    ([("interests", ASCENDING)], {"name": "interests"}),
+]
+
+# Queries the demo runs, whose plans check_query_plans() verifies:
+# name -> ("find" | "delete", filter) or ("update", filter, update)
+USER_QUERIES = {
+    "find_by_name": ("find", {"name": "John Doe"}),
+    "older_than": ("find", {"age": {"$gt": 30}}),
+    "by_interest": ("find", {"interests": "hiking"}),
+    "update_by_name": ("update", {"name": "John Doe"}, {"$set": {"age": 31}}),
+    "delete_by_name": ("delete", {"name": "Jane Smith"}),
+}
+
+# A plan may examine at most this many documents per document it matches
+MAX_EXAMINED_RATIO = 10
+
+
+def make_client(uri=connection_string, **options):
+    """MongoClient with POOL_OPTIONS, overridden by any options given.
+
+    The client is thread-safe and pools its connections, so create one per
+    process (see get_client) rather than one per request.
+    """
+    return MongoClient(uri, **{**POOL_OPTIONS, **options})
+
+
+def get_client(uri=connection_string, **options):
+    """The process's shared client, created and checked for readiness on first use"""
+    global _client
+    if _client is None:
+        client = make_client(uri, **options)
+        wait_until_ready(client)
+        _client = client
+    return _client
+
+
+def _backoff_delays(attempts, base_delay, max_delay):
+    """Waits between attempts: doubling from base_delay up to max_delay, with jitter"""
+    for attempt in range(attempts - 1):
+        yield min(base_delay * 2 ** attempt, max_delay) * random.uniform(0.5, 1.0)
+
+
+def wait_until_ready(client, attempts=READY_ATTEMPTS, base_delay=READY_BASE_DELAY, max_delay=READY_MAX_DELAY):
+    """Ping the server until it answers, backing off exponentially; re-raises the last failure"""
+    delays = _backoff_delays(attempts, base_delay, max_delay)
+    for attempt in range(1, attempts + 1):
+        try:
+            client.admin.command('ping')
+            return
+        except ConnectionFailure as e:
+            delay = next(delays, None)
+            if delay is None:
+                raise
+            print(f"MongoDB not ready (attempt {attempt}): {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def make_async_client(uri=connection_string, **options):
+    """AsyncMongoClient with POOL_OPTIONS, for asyncio code.
+
+    Operations awaited together (e.g. with asyncio.gather) run concurrently
+    over the pool, so their round trips overlap instead of queueing. Create
+    it inside the event loop that will use it.
+    """
+    return AsyncMongoClient(uri, **{**POOL_OPTIONS, **options})
+
+
+async def wait_until_ready_async(client, attempts=READY_ATTEMPTS, base_delay=READY_BASE_DELAY,
+                                 max_delay=READY_MAX_DELAY):
+    """wait_until_ready for an AsyncMongoClient"""
+    delays = _backoff_delays(attempts, base_delay, max_delay)
+    for attempt in range(1, attempts + 1):
+        try:
+            await client.admin.command('ping')
+            return
+        except ConnectionFailure as e:
+            delay = next(delays, None)
+            if delay is None:
+                raise
+            print(f"MongoDB not ready (attempt {attempt}): {e}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def gather_limited(operations, limit=POOL_OPTIONS["maxPoolSize"]):
+    """Await coroutines concurrently, at most limit at a time, and return their results in order.
+
+    Keeping limit at or below maxPoolSize stops a large burst from timing
+    out in the pool's wait queue.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(operation):
+        async with semaphore:
+            return await operation
+
+    return await asyncio.gather(*(run(operation) for operation in operations))
+
+
+def connect():
+    """Shared client for connection_string, exiting with troubleshooting tips if the server never answers"""
+    print(f"Connecting to MongoDB at {connection_string}")
+    try:
+        client = get_client()
+    except ConnectionFailure as e:
+        print(f"Could not connect to MongoDB: {e}")
+        print("\nTroubleshooting tips:")
+        print("1. Check if your MongoDB container is running: docker ps | grep mongo")
+        print("2. Verify port mapping: docker port CONTAINER_ID 27017")
+        print("3. Try connecting to the container IP directly")
+        print("4. Make sure host firewall allows connections to MongoDB port")
+        sys.exit(1)
+    print("Successfully connected to MongoDB container!")
+    return client
+
+
+def remove_duplicate_names(collection):
+    """Keep only the oldest user of each name, so the unique name index can be built.
+
+    Earlier versions of this script inserted the demo users on every run.
+    Users without a name are left alone. This deletes documents, so it only
+    runs when asked for (python mongo_ex.py dedupe). Returns how many
+    documents were deleted.
+    """
+    duplicates = collection.aggregate([
+        {"$match": {"name": {"$exists": True}}},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$name", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    extra = [object_id for group in duplicates for object_id in group["ids"][1:]]
+    if not extra:
+        return 0
+    deleted = collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    print(f"Removed {deleted} users with duplicate names from {collection.name}")
+    return deleted
+
+
+def ensure_indexes(collection, indexes=USER_INDEXES):
+    """Create the indexes; ones that already exist with the same spec are left alone"""
     try:
-        print(f"Attempt {attempt+1}: Connecting to MongoDB at {connection_string}")
-
-        # Connect with a short timeout to fail fast if not available
-        client = MongoClient(connection_string, serverSelectionTimeoutMS=5000)
-
-        # Test the connection
-        client.admin.command('ping')
-        print("Successfully connected to MongoDB container!")
-        break
-    except Exception as e:
-        print(f"Connection attempt {attempt+1} failed: {e}")
-        if attempt < max_retries - 1:
-            print(f"Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
+        names = collection.create_indexes([IndexModel(keys, **options) for keys, options in indexes])
+    except OperationFailure as e:
+        if e.code == 11000:
+            print(f"Cannot build a unique index on {collection.name}: it holds duplicate values "
+                  f"({e.details.get('errmsg') if e.details else e}). "
+                  f"Run python mongo_ex.py dedupe to keep the oldest user of each name.")
+        raise
+    print(f"Indexes on {collection.name}: {', '.join(names)}")
+    return names
+
+
+def explain_query(collection, query):
+    """executionStats explain of one USER_QUERIES entry; nothing is modified"""
+    operation, query_filter = query[0], query[1]
+    if operation == "find":
+        command = {"find": collection.name, "filter": query_filter}
+    elif operation == "update":
+        command = {"update": collection.name, "updates": [{"q": query_filter, "u": query[2]}]}
+    else:
+        command = {"delete": collection.name, "deletes": [{"q": query_filter, "limit": 1}]}
+    return collection.database.command("explain", command, verbosity="executionStats")
+
+
+def plan_stages(plan):
+    """Every stage name in an explain plan tree"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+def plan_problems(explain, max_ratio=MAX_EXAMINED_RATIO):
+    """What is wrong with an explain result: a COLLSCAN, or far more documents examined than matched"""
+    problems = []
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    stats = explain.get("executionStats", {})
+    examined = stats.get("totalDocsExamined", 0)
+    matched = max(stats.get("nReturned", 0), 1)
+    if examined > max_ratio * matched:
+        problems.append(f"examined {examined} documents for {stats.get('nReturned', 0)}")
+    return problems
+
+
+def check_query_plans(collection, queries=USER_QUERIES, max_ratio=MAX_EXAMINED_RATIO, explain=explain_query):
+    """Explain every query and return {name: problems} for those with a bad plan.
+
+    explain(collection, query) returns the explain document; pass your own
+    to check canned plans without a server, e.g. against a mock collection.
+    """
+    flagged = {}
+    for name, query in queries.items():
+        problems = plan_problems(explain(collection, query), max_ratio)
+        if problems:
+            print(f"  FLAGGED  {name}: {', '.join(problems)}")
+            flagged[name] = problems
         else:
-            print("\nTroubleshooting tips:")
-            print("1. Check if your MongoDB container is running: docker ps | grep mongo")
-            print("2. Verify port mapping: docker port CONTAINER_ID 27017")
-            print("3. Try connecting to the container IP directly")
-            print("4. Make sure host firewall allows connections to MongoDB port")
-            sys.exit(1)
-
-# Create or access a database
-db = client['example_database']
-
-# Create or access a collection (similar to a table in SQL)
-collection = db['users']
-
-# ----- INSERT OPERATIONS -----
-
-# Insert a single document
-user1 = {
-    "name": "John Doe",
-    "email": "john@example.com",
-    "age": 30,
-    "interests": ["programming", "hiking"]
-}
+            print(f"  ok       {name}")
+    return flagged
 
-result = collection.insert_one(user1)
-print(f"Inserted document with ID: {result.inserted_id}")
-
-# Insert multiple documents
-users = [
-    {
-        "name": "Jane Smith",
-        "email": "jane@example.com",
-        "age": 28,
-        "interests": ["reading", "travel"]
-    },
-    {
-        "name": "Bob Johnson",
-        "email": "bob@example.com",
-        "age": 35,
-        "interests": ["cooking", "photography"]
+
+def run_demo(collection):
+    # Names are unique, so clear out the users of any earlier run
+    collection.delete_many({"name": {"$in": ["John Doe", "Jane Smith", "Bob Johnson"]}})
+
+    # ----- INSERT OPERATIONS -----
+
+    # Insert a single document
+    user1 = {
+        "name": "John Doe",
+        "email": "john@example.com",
+        "age": 30,
+        "interests": ["programming", "hiking"]
     }
-]
 
-result = collection.insert_many(users)
-print(f"Inserted documents with IDs: {result.inserted_ids}")
+    result = collection.insert_one(user1)
+    print(f"Inserted document with ID: {result.inserted_id}")
+
+    # Insert multiple documents
+    users = [
+        {
+            "name": "Jane Smith",
+            "email": "jane@example.com",
+            "age": 28,
+            "interests": ["reading", "travel"]
+        },
+        {
+            "name": "Bob Johnson",
+            "email": "bob@example.com",
+            "age": 35,
+            "interests": ["cooking", "photography"]
+        }
+    ]
+
+    result = collection.insert_many(users)
+    print(f"Inserted documents with IDs: {result.inserted_ids}")
+
+    # ----- QUERY OPERATIONS -----
+
+    # Find one document
+    print("\nFinding one user:")
+    found_user = collection.find_one({"name": "John Doe"})
+    pp.pprint(found_user)
 
-# ----- QUERY OPERATIONS -----
+    # Find all documents
+    print("\nFinding all users:")
+    all_users = collection.find()
+    for user in all_users:
+        pp.pprint(user)
 
-# Find one document
-print("\nFinding one user:")
-found_user = collection.find_one({"name": "John Doe"})
-pp.pprint(found_user)
+    # Find with query filter
+    print("\nFinding users over 30:")
+    older_users = collection.find({"age": {"$gt": 30}})
+    for user in older_users:
+        pp.pprint(user)
 
-# Find all documents
-print("\nFinding all users:")
-all_users = collection.find()
-for user in all_users:
-    pp.pprint(user)
+    # ----- UPDATE OPERATIONS -----
 
-# Find with query filter
-print("\nFinding users over 30:")
-older_users = collection.find({"age": {"$gt": 30}})
-for user in older_users:
-    pp.pprint(user)
+    # Update a document
+    update_result = collection.update_one(
+        {"name": "John Doe"},
+        {"$set": {"age": 31, "interests": ["programming", "hiking", "chess"]}}
+    )
+    print(f"\nModified {update_result.modified_count} document")
+
+    # Verify the update
+    updated_user = collection.find_one({"name": "John Doe"})
+    print("Updated user:")
+    pp.pprint(updated_user)
+
+    # ----- DELETE OPERATIONS -----
+
+    # Delete one document
+    delete_result = collection.delete_one({"name": "Jane Smith"})
+    print(f"\nDeleted {delete_result.deleted_count} document")
+
+    # Count remaining documents
+    count = collection.count_documents({})
+    print(f"Remaining documents: {count}")
+
+
+async def run_async_demo(names):
+    """Look up and update many users concurrently from one event loop"""
+    client = make_async_client()
+    try:
+        await wait_until_ready_async(client)
+        collection = client['example_database']['users']
+        users = await gather_limited(collection.find_one({"name": name}, {"_id": 0}) for name in names)
+        for user in users:
+            pp.pprint(user)
+        results = await gather_limited(
+            collection.update_one({"name": name}, {"$inc": {"age": 1}}) for name in names)
+        print(f"Updated {sum(result.modified_count for result in results)} users concurrently")
+    finally:
+        await client.close()
 
-# ----- UPDATE OPERATIONS -----
 
-# Update a document
-update_result = collection.update_one(
-    {"name": "John Doe"},
-    {"$set": {"age": 31, "interests": ["programming", "hiking", "chess"]}}
-)
-print(f"\nModified {update_result.modified_count} document")
+if __name__ == "__main__":
+    client = connect()
 
-# Verify the update
-updated_user = collection.find_one({"name": "John Doe"})
-print("Updated user:")
-pp.pprint(updated_user)
+    # Create or access a database
+    db = client['example_database']
 
-# ----- DELETE OPERATIONS -----
+    # Create or access a collection (similar to a table in SQL)
+    collection = db['users']
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "dedupe":
+        # Deletes documents, so only on request; then build the indexes it was blocking
+        remove_duplicate_names(collection)
+        ensure_indexes(collection)
+        client.close()
+        sys.exit(0)
+    ensure_indexes(collection)
 
-# Delete one document
-delete_result = collection.delete_one({"name": "Jane Smith"})
-print(f"\nDeleted {delete_result.deleted_count} document")
+    if command == "check":
+        print("Checking query plans:")
+        flagged = check_query_plans(collection)
+        client.close()
+        sys.exit(1 if flagged else 0)
 
-# Count remaining documents
-count = collection.count_documents({})
-print(f"Remaining documents: {count}")
+    run_demo(collection)
+    asyncio.run(run_async_demo(["John Doe", "Bob Johnson"]))
 
-# Close connection
-client.close()
+    # Close connection
+    client.close()
@@ -1,451 +1,1352 @@
 # neo_ex.py
 # A complete demo program showing the benefits of Neo4j graph database
+import functools
+import itertools
+import json
+import re
+import sys
+import threading
 import time
+from pathlib import Path
 from neo4j import GraphDatabase
 import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Rows sent per UNWIND statement by the bulk loader
+DEFAULT_BATCH_SIZE = 10_000
+
+# Driver pool settings; the timeouts are in seconds
+DEFAULT_POOL_SIZE = 50
+DEFAULT_ACQUISITION_TIMEOUT = 60.0
+DEFAULT_RETRY_TIME = 30.0
+
+# Seconds to wait for new indexes to come online
+DEFAULT_INDEX_TIMEOUT = 300
+
+# Records pulled per round trip when exporting the graph
+DEFAULT_FETCH_SIZE = 10_000
+
+# Property used to look nodes up when creating relationships (default "name")
+NODE_KEYS = {"Movie": "title"}
+
+SOCIAL_NETWORK = {
+    # Unique key properties; each constraint also backs the index used by lookups
+    "constraints": [("Person", "name"), ("City", "name")],
+    "nodes": {
+        "Person": [
+            {"name": "Alice", "age": 32, "interests": ["Music", "Travel", "Reading"]},
+            {"name": "Bob", "age": 35, "interests": ["Sports", "Music", "Cooking"]},
+            {"name": "Charlie", "age": 28, "interests": ["Travel", "Photography"]},
+            {"name": "David", "age": 41, "interests": ["Technology", "Reading"]},
+            {"name": "Emma", "age": 29, "interests": ["Art", "Music", "Travel"]},
+            {"name": "Frank", "age": 33, "interests": ["Sports", "Movies"]},
+            {"name": "Grace", "age": 37, "interests": ["Technology", "Cooking"]},
+        ],
+        "City": [
+            {"name": "New York City"},
+            {"name": "San Francisco"},
+            {"name": "Los Angeles"},
+            {"name": "Chicago"},
+            {"name": "Boston"},
+        ],
+    },
+    "relationships": [
+        ("FRIEND", "Person", "Person", [
+            ("Alice", "Bob", {"since": 2015}),
+            ("Alice", "Emma", {"since": 2018}),
+            ("Alice", "Grace", {"since": 2020}),
+            ("Bob", "Charlie", {"since": 2012}),
+            ("Bob", "David", {"since": 2019}),
+            ("Charlie", "Emma", {"since": 2017}),
+            ("Charlie", "Frank", {"since": 2016}),
+            ("David", "Grace", {"since": 2014}),
+            ("Emma", "Frank", {"since": 2021}),
+            ("Frank", "Grace", {"since": 2018}),
+        ]),
+        ("LIVES_IN", "Person", "City", [
+            ("Alice", "New York City", {"since": 2010}),
+            ("Bob", "New York City", {"since": 2015}),
+            ("Charlie", "San Francisco", {"since": 2012}),
+            ("David", "Los Angeles", {"since": 2018}),
+            ("Emma", "Chicago", {"since": 2019}),
+            ("Frank", "Boston", {"since": 2014}),
+            ("Grace", "San Francisco", {"since": 2017}),
+        ]),
+        ("VISITED", "Person", "City", [
+            ("Alice", "San Francisco", {"year": 2019}),
+            ("Alice", "Los Angeles", {"year": 2021}),
+            ("Bob", "Chicago", {"year": 2020}),
+            ("Charlie", "New York City", {"year": 2018}),
+            ("Emma", "New York City", {"year": 2021}),
+            ("Emma", "San Francisco", {"year": 2019}),
+            ("Frank", "Los Angeles", {"year": 2017}),
+        ]),
+    ],
+}
+
+MOVIE_NETWORK = {
+    # Unique key properties; each constraint also backs the index used by lookups
+    "constraints": [("User", "name"), ("Movie", "title"), ("Actor", "name"), ("Director", "name")],
+    "nodes": {
+        "User": [
+            {"name": "User1", "age": 25},
+            {"name": "User2", "age": 34},
+            {"name": "User3", "age": 29},
+            {"name": "User4", "age": 42},
+            {"name": "User5", "age": 31},
+        ],
+        "Movie": [
+            {"title": "Inception", "year": 2010, "genre": "Sci-Fi"},
+            {"title": "The Dark Knight", "year": 2008, "genre": "Action"},
+            {"title": "The Matrix", "year": 1999, "genre": "Sci-Fi"},
+            {"title": "Pulp Fiction", "year": 1994, "genre": "Crime"},
+            {"title": "Forrest Gump", "year": 1994, "genre": "Drama"},
+            {"title": "The Godfather", "year": 1972, "genre": "Crime"},
+            {"title": "Interstellar", "year": 2014, "genre": "Sci-Fi"},
+        ],
+        "Actor": [
+            {"name": "Leonardo DiCaprio"},
+            {"name": "Christian Bale"},
+            {"name": "Keanu Reeves"},
+            {"name": "John Travolta"},
+            {"name": "Samuel L. Jackson"},
+            {"name": "Tom Hanks"},
+            {"name": "Al Pacino"},
+            {"name": "Matthew McConaughey"},
+        ],
+        "Director": [
+            {"name": "Christopher Nolan"},
+            {"name": "Lana Wachowski"},
+            {"name": "Quentin Tarantino"},
+            {"name": "Robert Zemeckis"},
+            {"name": "Francis Ford Coppola"},
+        ],
+    },
+    "relationships": [
+        ("ACTED_IN", "Actor", "Movie", [
+            ("Leonardo DiCaprio", "Inception"),
+            ("Christian Bale", "The Dark Knight"),
+            ("Keanu Reeves", "The Matrix"),
+            ("John Travolta", "Pulp Fiction"),
+            ("Samuel L. Jackson", "Pulp Fiction"),
+            ("Tom Hanks", "Forrest Gump"),
+            ("Al Pacino", "The Godfather"),
+            ("Matthew McConaughey", "Interstellar"),
+            ("Leonardo DiCaprio", "Interstellar"),
+        ]),
+        ("DIRECTED", "Director", "Movie", [
+            ("Christopher Nolan", "Inception"),
+            ("Christopher Nolan", "The Dark Knight"),
+            ("Christopher Nolan", "Interstellar"),
+            ("Lana Wachowski", "The Matrix"),
+            ("Quentin Tarantino", "Pulp Fiction"),
+            ("Robert Zemeckis", "Forrest Gump"),
+            ("Francis Ford Coppola", "The Godfather"),
+        ]),
+        # Complete ratings for all users
+        ("RATED", "User", "Movie", [
+            ("User1", "Inception", {"rating": 5}),
+            ("User1", "The Dark Knight", {"rating": 4}),
+            ("User1", "The Matrix", {"rating": 5}),
+            ("User1", "Interstellar", {"rating": 3}),
+            ("User2", "Inception", {"rating": 3}),
+            ("User2", "Pulp Fiction", {"rating": 5}),
+            ("User2", "The Godfather", {"rating": 4}),
+            ("User3", "Inception", {"rating": 4}),
+            ("User3", "The Matrix", {"rating": 5}),
+            ("User3", "The Dark Knight", {"rating": 4}),
+            ("User3", "Forrest Gump", {"rating": 3}),
+            ("User4", "The Godfather", {"rating": 5}),
+            ("User4", "Forrest Gump", {"rating": 4}),
+            ("User4", "Pulp Fiction", {"rating": 3}),
+            ("User5", "Interstellar", {"rating": 5}),
+            ("User5", "Inception", {"rating": 4}),
+            ("User5", "The Matrix", {"rating": 3}),
+        ]),
+    ],
+}
+
+# Cypher behind each demo, by name, so the schema checker can EXPLAIN them
+DEMO_QUERIES = {
+    "friends_of_friends": """
+        MATCH (alice:Person {name: 'Alice'})-[:FRIEND]->(friend)-[:FRIEND]->(friendOfFriend)
+        WHERE friendOfFriend <> alice
+        RETURN DISTINCT friendOfFriend.name as name
+    """,
+    "actors_with_director": """
+        MATCH (actor:Actor)-[:ACTED_IN]->(:Movie)<-[:DIRECTED]-(director:Director {name: 'Christopher Nolan'})
+        RETURN DISTINCT actor.name as name
+    """,
+    "lived_and_visited": """
+        MATCH (person:Person)-[:LIVES_IN]->(homeCity:City)
+        MATCH (person)-[:VISITED]->(visitedCity:City)
+        WHERE homeCity <> visitedCity
+        RETURN person.name as name, homeCity.name as home, 
+               collect(DISTINCT visitedCity.name) as visited
+        ORDER BY name
+    """,
+    "shortest_path": """
+        MATCH p=shortestPath((a:Person {name: 'Alice'})-[*]-(f:Person {name: 'Frank'}))
+        RETURN [node in nodes(p) | coalesce(node.name, node.title)] AS path
+    """,
+    "social_summary": """
+        MATCH (person:Person)
+        OPTIONAL MATCH (person)-[:FRIEND]->(friend:Person)
+        WITH person, count(friend) as friendCount
+        MATCH (person)-[:LIVES_IN]->(city:City)
+        OPTIONAL MATCH (person)-[:VISITED]->(visitedCity:City)
+        RETURN person.name as name, 
+               friendCount,
+               city.name as home,
+               count(DISTINCT visitedCity) as citiesVisited
+        ORDER BY friendCount DESC
+    """,
+    "add_properties": """
+        MATCH (alice:Person {name: 'Alice'})
+        SET alice.occupation = 'Software Engineer', 
+            alice.languages = ['English', 'Spanish']
+    """,
+    "add_event": """
+        CREATE (conference:Event {
+            name: 'Tech Conference 2023', 
+            date: '2023-11-15', 
+            location: 'San Francisco'
+        })
+        WITH conference
+        MATCH (person:Person)
+        WHERE person.name IN ['Alice', 'David', 'Grace']
+        CREATE (person)-[:ATTENDED {role: CASE 
+                                        WHEN person.name = 'Alice' THEN 'Speaker'
+                                        WHEN person.name = 'David' THEN 'Organizer'
+                                        ELSE 'Attendee' 
+                                     END}]->(conference)
+    """,
+    "event_attendees": """
+        MATCH (person:Person)-[r:ATTENDED]->(event:Event)
+        RETURN person.name as name, r.role as role, event.name as event
+    """,
+    "person_node": """
+        MATCH (alice:Person {name: 'Alice'}) 
+        RETURN alice
+    """,
+}
+
+# Every rating, used to build the RatingRecommender
+RATINGS_QUERY = """
+    MATCH (user:User)-[r:RATED]->(movie:Movie)
+    RETURN user.name AS user, movie.title AS title, r.rating AS rating
+"""
+
+# Add or change ratings in UNWIND batches
+RATE_QUERY = """
+    UNWIND $rows AS row
+    MATCH (user:User {name: row.user})
+    MATCH (movie:Movie {title: row.title})
+    MERGE (user)-[r:RATED]->(movie)
+    SET r.rating = row.rating
+"""
+
+# Plan operators that visit every node of a label (or every node) instead of seeking
+SCAN_OPERATORS = {"NodeByLabelScan", "UnionNodeByLabelsScan", "AllNodesScan",
+                  "DirectedAllRelationshipsScan", "UndirectedAllRelationshipsScan"}
+
+# Scans of the whole database, flagged even in queries that are allowed a label scan
+GLOBAL_SCAN_OPERATORS = {"AllNodesScan", "DirectedAllRelationshipsScan", "UndirectedAllRelationshipsScan"}
+
+# Demo queries that legitimately visit every Person, so a label scan is expected
+FULL_SCAN_QUERIES = {"lived_and_visited", "social_summary", "event_attendees", "export_graph"}
+
+# Labels and relationship types exported by demo_benefit_5
+DEMO_EXPORT = (("Person", "City"), ("FRIEND", "LIVES_IN"))
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _identifier(name):
+    """Validate a label, relationship type or property name before it is spliced into Cypher"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid Cypher identifier: {name!r}")
+    return name
+
+
+def export_query(node_labels, rel_types):
+    """Cypher returning every node with one of node_labels, then every rel_types relationship between such nodes.
+
+    The labels and types are spliced in as alternatives (n:Person|City), so
+    the planner starts from label scans instead of every node in the
+    database. Node rows have a null target; the type column holds the label
+    or relationship type.
+    """
+    if not node_labels:
+        raise ValueError("export_query needs at least one node label")
+    labels = "|".join(_identifier(label) for label in node_labels)
+    label_list = ", ".join(f"'{label}'" for label in node_labels)
+    branches = [f"""
+        MATCH (n:{labels})
+        RETURN coalesce(n.name, n.title) AS source, null AS target,
+               [label IN labels(n) WHERE label IN [{label_list}]][0] AS type"""]
+    if rel_types:
+        types = "|".join(_identifier(rel_type) for rel_type in rel_types)
+        branches.append(f"""
+        MATCH (a:{labels})-[r:{types}]->(b:{labels})
+        RETURN coalesce(a.name, a.title) AS source, coalesce(b.name, b.title) AS target,
+               type(r) AS type""")
+    union = "\n        UNION ALL".join(branches)
+    return f"""
+    CALL {{{union}
+    }}
+    RETURN source, target, type
+"""
+
+
+def _relationship_row(row):
+    """Normalise a (start, end[, properties]) tuple into the dict the loader sends"""
+    if isinstance(row, dict):
+        return {"start": row["start"], "end": row["end"],
+                "properties": row.get("properties") or {}}
+    start, end, *rest = row
+    return {"start": start, "end": end, "properties": rest[0] if rest else {}}
+
+
+def _read_rows(path, batch_size):
+    """Yield the rows of a CSV or Parquet file as dicts, reading batch_size rows at a time"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                yield {key: value for key, value in row.items() if value is not None}
+    else:
+        # Arrow dtypes keep integer columns with blank cells as ints (NumPy
+        # would make them float64); blanks come back as None and are dropped
+        for chunk in pd.read_csv(path, chunksize=batch_size, dtype_backend="pyarrow"):
+            for row in chunk.to_dict("records"):
+                yield {key: value for key, value in row.items() if value is not None}
+
+
+def _unique_in_order(nodes):
+    """Distinct node ids in order of first appearance"""
+    _, first = np.unique(nodes, return_index=True)
+    return nodes[np.sort(first)]
+
+
+def _load_stats(count, duration, description):
+    """Print and return the throughput of a bulk load"""
+    rate = count / duration if duration > 0 else float("inf")
+    print(f"Loaded {count} {description} in {duration:.3f} seconds ({rate:,.0f}/sec)")
+    return {"count": count, "seconds": duration, "per_second": rate}
+
+
+def _run_batch(tx, query, rows):
+    """Transaction function used by the bulk loader"""
+    tx.run(query, rows=rows).consume()
+
+
+def _collect_export(tx, query, params):
+    """Transaction function that splits export_query() records into GraphExport columns"""
+    node_names, node_types = [], []
+    edge_sources, edge_targets, edge_types = [], [], []
+    for source, target, kind in tx.run(query, params):
+        if target is None:
+            node_names.append(source)
+            node_types.append(kind.lower())
+        else:
+            edge_sources.append(source)
+            edge_targets.append(target)
+            edge_types.append(kind.lower())
+    return node_names, node_types, edge_sources, edge_targets, edge_types
+
+
+def _fetch_all(tx, query, params):
+    """Transaction function that returns every record of a query"""
+    return list(tx.run(query, params))
+
+
+def _fetch_with_summary(tx, query, params):
+    """Transaction function that returns every record of a query and its summary"""
+    result = tx.run(query, params)
+    records = list(result)
+    return records, result.consume()
+
+
+def _plan_operators(plan):
+    """Flatten a PROFILE plan tree into one dict per operator, root first"""
+    operators = [{"operator": plan["operatorType"],
+                  "db_hits": plan.get("dbHits", 0),
+                  "rows": plan.get("rows", 0)}]
+    for child in plan.get("children", ()):
+        operators.extend(_plan_operators(child))
+    return operators
+
+
+def _describe_timings(timings):
+    """One-line split of a profiled query into server and transfer time"""
+    if "available_after_ms" not in timings:
+        return f"  (in-process: {timings['wall_ms']:.3f} ms)"
+    server_ms = timings["available_after_ms"] + timings["consumed_after_ms"]
+    line = (f"  (server: first record after {timings['available_after_ms']} ms, "
+            f"consumed after {timings['consumed_after_ms']} ms; "
+            f"transfer/client: {timings['wall_ms'] - server_ms:.3f} ms")
+    if "db_hits" in timings:
+        line += f"; {timings['db_hits']} db hits"
+    return line + ")"
+
+
+class InMemoryGraph:
+    """In-process property graph that answers the demo queries without a server.
+
+    Nodes are numbered densely and indexed by label and by their key property
+    (see NODE_KEYS), so anchor lookups are dictionary hits. Relationships are
+    staged per type and compiled on first use into CSR arrays (indptr,
+    indices, edge ids) for each direction, which the traversals below expand
+    a whole frontier at a time with NumPy.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Drop all nodes and relationships"""
+        self.labels = []          # node id -> label
+        self.properties = []      # node id -> property dict
+        self._label_index = {}    # label -> list of node ids
+        self._key_index = {}      # label -> {key value: node id}
+        self._rel_start = {}      # rel type -> list of start node ids
+        self._rel_end = {}        # rel type -> list of end node ids
+        self._rel_properties = {} # rel type -> list of property dicts
+        self._cache = {}          # compiled CSR arrays, property columns and other key indexes
+
+    @property
+    def node_count(self):
+        return len(self.properties)
+
+    def add_nodes(self, label, rows):
+        """Add one node per property dict and return how many were added"""
+        key = NODE_KEYS.get(label, "name")
+        ids = self._label_index.setdefault(label, [])
+        index = self._key_index.setdefault(label, {})
+        count = 0
+        for row in rows:
+            node = len(self.properties)
+            self.labels.append(label)
+            self.properties.append(dict(row))
+            ids.append(node)
+            if key in row:
+                index[row[key]] = node
+            count += 1
+        self._cache.clear()
+        return count
+
+    def add_relationships(self, rel_type, start_label, end_label, rows,
+                          start_key="name", end_key="name"):
+        """Add relationships between existing nodes and return how many were added.
+
+        Rows use the same shapes as GraphDatabaseDemo.load_relationships; rows
+        whose endpoints do not exist are skipped, as a Cypher MATCH would.
+        """
+        start_index, end_index = self._index(start_label, start_key), self._index(end_label, end_key)
+        starts = self._rel_start.setdefault(rel_type, [])
+        ends = self._rel_end.setdefault(rel_type, [])
+        properties = self._rel_properties.setdefault(rel_type, [])
+        count = 0
+        for row in map(_relationship_row, rows):
+            start = start_index.get(row["start"])
+            end = end_index.get(row["end"])
+            if start is None or end is None:
+                continue
+            starts.append(start)
+            ends.append(end)
+            properties.append(dict(row["properties"]))
+            count += 1
+        self._cache.clear()
+        return count
+
+    def merge_relationships(self, rel_type, start_label, end_label, rows,
+                            start_key="name", end_key="name"):
+        """Like add_relationships, but update the properties of an existing relationship.
+
+        Matches MERGE ... SET: each (start, end) pair has at most one
+        relationship of rel_type, and a row for a pair that already has one
+        overwrites the given properties instead of adding a second one.
+        Returns how many relationships were added.
+        """
+        existing = {pair: edge for edge, pair in enumerate(zip(self._rel_start.get(rel_type, ()),
+                                                               self._rel_end.get(rel_type, ())))}
+        properties = self._rel_properties.get(rel_type, [])
+        start_index, end_index = self._index(start_label, start_key), self._index(end_label, end_key)
+        new_rows = {}   # (start, end) -> row still to be added
+        for row in map(_relationship_row, rows):
+            pair = (start_index.get(row["start"]), end_index.get(row["end"]))
+            if pair in existing:
+                properties[existing[pair]].update(row["properties"])
+            elif pair in new_rows:
+                new_rows[pair]["properties"].update(row["properties"])
+            else:
+                new_rows[pair] = {**row, "properties": dict(row["properties"])}
+        return self.add_relationships(rel_type, start_label, end_label, new_rows.values(),
+                                      start_key, end_key)
+
+    def node_id(self, label, value, key=None):
+        """Look a node up by its key property (or key), returning None if it does not exist"""
+        return self._index(label, key or NODE_KEYS.get(label, "name")).get(value)
+
+    def nodes(self, label):
+        """Ids of every node with the given label"""
+        return np.asarray(self._label_index.get(label, ()), dtype=np.int64)
+
+    def display_name(self, node):
+        """Equivalent of coalesce(node.name, node.title)"""
+        properties = self.properties[node]
+        return properties.get("name", properties.get("title"))
+
+    def friends_of_friends(self, name):
+        """Names of people two FRIEND hops away from name, excluding themselves"""
+        person = self.node_id("Person", name)
+        if person is None:
+            return []
+        _, friends, _ = self._expand([person], "FRIEND")
+        _, candidates, _ = self._expand(friends, "FRIEND")
+        candidates = candidates[candidates != person]
+        return [self.display_name(node) for node in _unique_in_order(candidates)]
+
+    def actors_with_director(self, name):
+        """Names of actors who acted in a movie the director directed"""
+        director = self.node_id("Director", name)
+        if director is None:
+            return []
+        _, movies, _ = self._expand([director], "DIRECTED")
+        _, actors, _ = self._expand(movies, "ACTED_IN", direction="in")
+        return [self.display_name(node) for node in _unique_in_order(actors)]
+
+    def lived_and_visited(self):
+        """(name, home city, [other visited cities]) for each Person, ordered by name"""
+        people = self.nodes("Person")
+        rows = []
+        home_pair, homes, _ = self._expand(people, "LIVES_IN")
+        for person, home in zip(people[home_pair], homes):
+            _, visited, _ = self._expand([person], "VISITED")
+            visited = _unique_in_order(visited[visited != home])
+            if visited.size:
+                rows.append((self.display_name(person), self.display_name(home),
+                             [self.display_name(city) for city in visited]))
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+    def social_summary(self):
+        """(name, friend count, home city, distinct cities visited), most friends first"""
+        people = self.nodes("Person")
+        indptr, _, _ = self._adjacency("FRIEND")
+        friend_counts = indptr[people + 1] - indptr[people]
+
+        visit_pair, visited, _ = self._expand(people, "VISITED")
+        distinct = np.unique(np.stack([visit_pair, visited]), axis=1)[0]
+        visit_counts = np.bincount(distinct, minlength=people.size)
+
+        home_pair, homes, _ = self._expand(people, "LIVES_IN")
+        rows = [(self.display_name(people[i]), int(friend_counts[i]),
+                 self.display_name(home), int(visit_counts[i]))
+                for i, home in zip(home_pair, homes)]
+        rows.sort(key=lambda row: -row[1])
+        return rows
+
+    def shortest_path(self, start_label, start, end_label, end):
+        """Display names along an unweighted shortest path, ignoring direction and type.
+
+        Runs a breadth-first search that expands the whole frontier per step.
+        Returns None when either endpoint is missing or they are not connected.
+        """
+        source = self.node_id(start_label, start)
+        target = self.node_id(end_label, end)
+        if source is None or target is None:
+            return None
+
+        parent = np.full(self.node_count, -1, dtype=np.int64)
+        parent[source] = source
+        frontier = np.array([source], dtype=np.int64)
+        while frontier.size and parent[target] < 0:
+            pair, reached, _ = self._expand(frontier, None, direction="both")
+            fresh = parent[reached] < 0
+            reached, first = np.unique(reached[fresh], return_index=True)
+            parent[reached] = frontier[pair[fresh][first]]
+            frontier = reached
+        if parent[target] < 0:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parent[path[-1]]))
+        return [self.display_name(node) for node in reversed(path)]
+
+    def relationship_rows(self, rel_type, key):
+        """(start name, end name, property value) for every relationship of rel_type"""
+        for start, end, properties in zip(self._rel_start.get(rel_type, ()),
+                                          self._rel_end.get(rel_type, ()),
+                                          self._rel_properties.get(rel_type, ())):
+            yield self.display_name(start), self.display_name(end), properties.get(key)
+
+    def export(self, node_labels, rel_types):
+        """Columns for a GraphExport of the given labels and relationship types"""
+        names = np.array([self.display_name(node) for node in range(self.node_count)], dtype=object)
+        labels = np.asarray(self.labels, dtype=object)
+        nodes = np.flatnonzero(np.isin(labels, list(node_labels)))
+
+        edge_sources, edge_targets, edge_types = [], [], []
+        for rel_type in rel_types:
+            start = np.asarray(self._rel_start.get(rel_type, ()), dtype=np.int64)
+            end = np.asarray(self._rel_end.get(rel_type, ()), dtype=np.int64)
+            keep = np.isin(labels[start], list(node_labels)) & np.isin(labels[end], list(node_labels))
+            edge_sources.append(names[start[keep]])
+            edge_targets.append(names[end[keep]])
+            edge_types.append(np.full(np.count_nonzero(keep), rel_type.lower(), dtype=object))
+
+        return (names[nodes], np.char.lower(labels[nodes].astype(str)).astype(object),
+                np.concatenate(edge_sources or [np.empty(0, dtype=object)]),
+                np.concatenate(edge_targets or [np.empty(0, dtype=object)]),
+                np.concatenate(edge_types or [np.empty(0, dtype=object)]))
+
+    def _index(self, label, key):
+        """{value: node id} of the label's nodes by property key.
+
+        The label's key property (see NODE_KEYS) is indexed as nodes are
+        added; any other key is indexed on first use and kept until the
+        next change.
+        """
+        if key == NODE_KEYS.get(label, "name"):
+            return self._key_index.setdefault(label, {})
+        cache_key = ("index", label, key)
+        if cache_key not in self._cache:
+            self._cache[cache_key] = {self.properties[node][key]: node
+                                      for node in self._label_index.get(label, ())
+                                      if key in self.properties[node]}
+        return self._cache[cache_key]
+
+    def _expand(self, nodes, rel_type, direction="out"):
+        """Follow rel_type from every node in nodes at once.
+
+        Returns three aligned arrays: the position in nodes each hop started
+        from, the node reached and the id of the relationship followed.
+        """
+        indptr, indices, edges = self._adjacency(rel_type, direction)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts = indptr[nodes]
+        counts = indptr[nodes + 1] - starts
+        positions = np.repeat(np.arange(nodes.size), counts)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return positions, indices[offsets], edges[offsets]
+
+    def _adjacency(self, rel_type, direction="out"):
+        """CSR arrays for one relationship type (None means every type)"""
+        cache_key = ("csr", rel_type, direction)
+        if cache_key not in self._cache:
+            types = self._rel_start if rel_type is None else [rel_type]
+            start = np.concatenate([np.asarray(self._rel_start.get(t, ()), dtype=np.int64)
+                                    for t in types] or [np.empty(0, dtype=np.int64)])
+            end = np.concatenate([np.asarray(self._rel_end.get(t, ()), dtype=np.int64)
+                                  for t in types] or [np.empty(0, dtype=np.int64)])
+            edges = np.arange(start.size, dtype=np.int64)
+            if direction == "in":
+                start, end = end, start
+            elif direction == "both":
+                start, end = np.concatenate([start, end]), np.concatenate([end, start])
+                edges = np.concatenate([edges, edges])
+
+            order = np.argsort(start, kind="stable")
+            indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(start, minlength=self.node_count), out=indptr[1:])
+            self._cache[cache_key] = (indptr, end[order], edges[order])
+        return self._cache[cache_key]
+
+
+class GraphExport:
+    """Nodes and relationships extracted from the graph as flat columns.
+
+    Node and edge types are the lower-cased label / relationship type. The
+    NetworkX graph, the sparse adjacency matrix and the layout are built in
+    bulk on first access, so callers that only need counts never pay for them.
+    """
+
+    def __init__(self, node_names, node_types, edge_sources, edge_targets, edge_types):
+        self.node_names = list(node_names)
+        self.node_types = np.asarray(node_types, dtype=object)
+        self.edge_sources = np.asarray(edge_sources, dtype=object)
+        self.edge_targets = np.asarray(edge_targets, dtype=object)
+        self.edge_types = np.asarray(edge_types, dtype=object)
+
+    def count_nodes(self, node_type):
+        return int(np.count_nonzero(self.node_types == node_type))
+
+    def count_edges(self, edge_type):
+        return int(np.count_nonzero(self.edge_types == edge_type))
+
+    @property
+    def edge_list(self):
+        return list(zip(self.edge_sources, self.edge_targets))
+
+    def node_colors(self, colors=None):
+        """One color per node in node_names order"""
+        colors = colors or {"person": "skyblue"}
+        return [colors.get(node_type, "lightgreen") for node_type in self.node_types]
+
+    def edge_colors(self, colors=None):
+        """One color per edge in edge_list order"""
+        colors = colors or {"friend": "gray"}
+        return [colors.get(edge_type, "red") for edge_type in self.edge_types]
+
+    @functools.cached_property
+    def graph(self):
+        """Undirected NetworkX graph with a "type" attribute on nodes and edges"""
+        G = nx.Graph()
+        G.add_nodes_from(zip(self.node_names, ({"type": t} for t in self.node_types)))
+        G.add_edges_from(zip(self.edge_sources, self.edge_targets,
+                             ({"type": t} for t in self.edge_types)))
+        return G
+
+    @functools.cached_property
+    def adjacency(self):
+        """Directed SciPy CSR adjacency matrix, rows and columns in node_names order"""
+        index = pd.Index(self.node_names)
+        rows = index.get_indexer(self.edge_sources)
+        cols = index.get_indexer(self.edge_targets)
+        n = len(self.node_names)
+        return sparse.coo_array((np.ones(rows.size), (rows, cols)), shape=(n, n)).tocsr()
+
+    @functools.cached_property
+    def layout(self):
+        """Spring layout positions, computed on first access only"""
+        return nx.spring_layout(self.graph, seed=42)
+
+
+class QueryProfiler:
+    """Latency samples per named query, summarised as percentiles and histograms.
+
+    Each sample is the timings dict produced by GraphDatabaseDemo.profile_query:
+    wall_ms covers the round trip up to full consumption, while
+    available_after_ms and consumed_after_ms are the server's own planning +
+    execution and streaming times, so the remainder is transfer/client time.
+    """
+
+    def __init__(self):
+        self.samples = {}   # query name -> list of wall_ms
+        self.last = {}      # query name -> timings of the most recent run
+
+    def record(self, name, timings):
+        """Store one run of a query and return its timings"""
+        self.samples.setdefault(name, []).append(timings["wall_ms"])
+        self.last[name] = timings
+        return timings
+
+    def percentiles(self, name):
+        """Count, p50, p95, p99 and max wall time (ms) of a query"""
+        samples = np.asarray(self.samples.get(name, ()), dtype=np.float64)
+        if samples.size == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {"count": int(samples.size), "p50": float(p50), "p95": float(p95),
+                "p99": float(p99), "max": float(samples.max())}
+
+    def histogram(self, name, bins=20):
+        """Bucket counts and bucket edges (ms) of a query's wall times"""
+        samples = np.asarray(self.samples.get(name, ()), dtype=np.float64)
+        if samples.size == 0:
+            return {"counts": [], "edges": []}
+        counts, edges = np.histogram(samples, bins=bins)
+        return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+    def to_json(self, path=None, bins=20):
+        """Serialise every query's percentiles, histogram and last timings, optionally to a file"""
+        report = {name: {"latency_ms": self.percentiles(name),
+                         "histogram": self.histogram(name, bins),
+                         "last": self.last[name]}
+                  for name in self.samples}
+        text = json.dumps(report, indent=2, default=str)
+        if path:
+            Path(path).write_text(text)
+        return text
+
+
+class SchemaManager:
+    """Creates the constraints and indexes behind a dataset's anchor lookups and checks plans.
+
+    Datasets declare "constraints" (unique key properties) and optionally
+    "indexes" as (label, property) pairs. Everything is created with IF NOT
+    EXISTS, so ensure() is safe to call before every load.
+    """
+
+    def __init__(self, demo):
+        self.demo = demo
+
+    @staticmethod
+    def statements(dataset):
+        """The CREATE CONSTRAINT / CREATE INDEX statements a dataset needs"""
+        for label, prop in dataset.get("constraints", ()):
+            name = f"{label.lower()}_{prop}_unique"
+            yield (f"CREATE CONSTRAINT {_identifier(name)} IF NOT EXISTS "
+                   f"FOR (n:{_identifier(label)}) REQUIRE n.{_identifier(prop)} IS UNIQUE")
+        for label, prop in dataset.get("indexes", ()):
+            name = f"{label.lower()}_{prop}"
+            yield (f"CREATE INDEX {_identifier(name)} IF NOT EXISTS "
+                   f"FOR (n:{_identifier(label)}) ON (n.{_identifier(prop)})")
+
+    def ensure(self, dataset, timeout=DEFAULT_INDEX_TIMEOUT):
+        """Create the dataset's schema and wait up to timeout seconds for it to come online"""
+        if self.demo.graph is not None:
+            # The in-memory backend indexes every label and key property itself
+            return
+        for statement in self.statements(dataset):
+            self.demo.write(statement)
+        self.demo.read("CALL db.awaitIndexes($timeout)", timeout=timeout)
+
+    def check_plans(self, queries=None, allowed=FULL_SCAN_QUERIES):
+        """EXPLAIN each query and report the ones whose plan scans a whole label or all nodes.
+
+        queries defaults to DEMO_QUERIES plus the demo's export_query().
+        Returns {name: [offending operators]} for every flagged query; queries
+        in allowed are expected to visit every node of a label and are only
+        reported, not flagged, unless they scan the whole database.
+        """
+        if queries is None:
+            queries = {**DEMO_QUERIES, "export_graph": export_query(*DEMO_EXPORT)}
+        flagged = {}
+        for name, query in queries.items():
+            _, summary = self.demo._session().execute_write(_fetch_with_summary, "EXPLAIN " + query, {})
+            scans = [operator["operator"] for operator in _plan_operators(summary.plan)
+                     if operator["operator"].split("@")[0] in SCAN_OPERATORS]
+            if not scans:
+                print(f"  ok       {name}")
+            elif name in allowed and not any(scan.split("@")[0] in GLOBAL_SCAN_OPERATORS for scan in scans):
+                print(f"  expected {name}: {', '.join(scans)}")
+            else:
+                print(f"  FLAGGED  {name}: {', '.join(scans)}")
+                flagged[name] = scans
+        return flagged
+
+
+class RatingRecommender:
+    """Item-item collaborative filtering over RATED relationships, served from memory.
+
+    Ratings are held in a sparse user x movie matrix R together with the
+    item co-rating matrix G = R^T R. Cosine similarity between two movies is
+    G[i, j] / sqrt(G[i, i] G[j, j]), so nothing dense is ever materialised.
+    add_ratings() patches R and G for the affected users only, which keeps
+    refreshes proportional to the new ratings rather than the whole history.
+    """
+
+    def __init__(self):
+        self.users = {}     # user name -> row
+        self.movies = {}    # movie title -> column
+        self.titles = []    # column -> movie title
+        self.matrix = sparse.csr_array((0, 0))
+        self.gram = sparse.csr_array((0, 0))
+        self._top = {}      # (user, n) -> cached recommendations
+
+    def add_ratings(self, ratings):
+        """Add or overwrite (user, title, rating) triples and update the similarity index"""
+        users, movies, values = [], [], []
+        for user, title, rating in ratings:
+            users.append(self.users.setdefault(user, len(self.users)))
+            if title not in self.movies:
+                self.movies[title] = len(self.titles)
+                self.titles.append(title)
+            movies.append(self.movies[title])
+            values.append(rating)
+        if not users:
+            return 0
+
+        shape = (len(self.users), len(self.titles))
+        self.matrix.resize(shape)
+        self.gram.resize((shape[1], shape[1]))
+
+        # Rows of the affected users before and after the change; later duplicates win
+        affected, local = np.unique(users, return_inverse=True)
+        updates = {}
+        for row, movie, value in zip(local, movies, values):
+            updates[(row, movie)] = value
+        keys = np.array(list(updates), dtype=np.int64).reshape(-1, 2)
+        changes = sparse.csr_array(
+            (np.array(list(updates.values()), dtype=np.float64), (keys[:, 0], keys[:, 1])),
+            shape=(affected.size, shape[1]))
+        old = self.matrix[affected]
+        # Keep the old ratings of each affected user unless this batch overwrote them
+        kept = old - old.multiply(changes != 0)
+        new = kept + changes
+
+        select = sparse.csr_array((np.ones(affected.size), (affected, np.arange(affected.size))),
+                                  shape=(shape[0], affected.size))
+        self.matrix = (self.matrix + select @ (new - old)).tocsr()
+        self.matrix.eliminate_zeros()
+        self.gram = (self.gram + new.T @ new - old.T @ old).tocsr()
+        self.gram.eliminate_zeros()
+        self._top.clear()
+        return len(values)
+
+    def recommend(self, user, n=3):
+        """Top n (title, predicted rating) pairs for movies the user has not rated"""
+        key = (user, n)
+        if key not in self._top:
+            self._top[key] = self._recommend(user, n)
+        return self._top[key]
+
+    def _recommend(self, user, n):
+        row = self.users.get(user)
+        if row is None:
+            return []
+        ratings = self.matrix[[row]]
+        norms = np.sqrt(self.gram.diagonal())
+        inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+        # Similarity-weighted average of the user's ratings: sum r_i sim(i, j) / sum sim(i, j)
+        weighted = (ratings.multiply(inverse[None, :]) @ self.gram).toarray().ravel() * inverse
+        rated = (ratings != 0).astype(np.float64)
+        total = (rated.multiply(inverse[None, :]) @ self.gram).toarray().ravel() * inverse
+        scores = np.divide(weighted, total, out=np.full_like(total, -np.inf), where=total > 0)
+        scores[ratings.indices] = -np.inf
+
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if candidates.size > n:
+            candidates = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.titles[i], float(scores[i])) for i in best]
+
 
 class GraphDatabaseDemo:
-    def __init__(self, uri=None, username=None, password=None):
+    def __init__(self, uri=None, username=None, password=None,
+                 max_connection_pool_size=DEFAULT_POOL_SIZE,
+                 connection_acquisition_timeout=DEFAULT_ACQUISITION_TIMEOUT,
+                 max_transaction_retry_time=DEFAULT_RETRY_TIME,
+                 verify_connectivity=True, backend="neo4j"):
         # Default connection parameters if none provided
         self.uri = uri or "bolt://localhost:7687"
         self.username = username or "neo4j"
         self.password = password or "password"
 
+        # One session per worker thread, reused across queries (sessions are not thread safe)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+        # Latency samples of the queries run through profile_query
+        self.profiler = QueryProfiler()
+        self.schema = SchemaManager(self)
+        self._recommender = None
+
+        # The "memory" backend keeps the datasets in an InMemoryGraph instead of Neo4j
+        self.driver = None
+        self.graph = None
+        if backend == "memory":
+            self.graph = InMemoryGraph()
+            print("Using the in-memory graph backend")
+            return
+        if backend != "neo4j":
+            raise ValueError(f"Unknown backend: {backend!r}")
+
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.username, self.password))
-            # Test the connection
-            with self.driver.session() as session:
-                session.run("RETURN 1")
+            self.driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.username, self.password),
+                max_connection_pool_size=max_connection_pool_size,
+                connection_acquisition_timeout=connection_acquisition_timeout,
+                max_transaction_retry_time=max_transaction_retry_time,
+            )
+            # Test the connection without running a query
+            if verify_connectivity:
+                self.driver.verify_connectivity()
             print("Connected to Neo4j database successfully")
         except Exception as e:
             print(f"Failed to connect to Neo4j: {e}")
             self.driver = None
             raise  # Let the caller handle the exception
 
+    @property
+    def connected(self):
+        """True when there is a Neo4j connection or an in-memory graph to query"""
+        return self.driver is not None or self.graph is not None
+
     def close(self):
         """Close the database connection"""
         if self.driver:
+            with self._sessions_lock:
+                for session in self._sessions:
+                    session.close()
+                self._sessions.clear()
+            self._local = threading.local()
             self.driver.close()
             print("Connection to Neo4j closed")
 
+    def read(self, query, **params):
+        """Run a read query in a managed transaction and return its records.
+
+        Transient failures (leader switches, deadlocks, dropped connections)
+        are retried by the driver for up to max_transaction_retry_time.
+        """
+        return self._session().execute_read(_fetch_all, query, params)
+
+    def write(self, query, **params):
+        """Run a write query in a managed transaction and return its records"""
+        return self._session().execute_write(_fetch_all, query, params)
+
+    def profile_query(self, name, query, profile=False, **params):
+        """Run a read query to full consumption and record its latency breakdown under name.
+
+        With profile=True the query is prefixed with PROFILE and the db hits
+        and rows of every plan operator are captured as well. Returns the
+        records and the timings dict.
+        """
+        if profile:
+            query = "PROFILE " + query
+        start_time = time.perf_counter()
+        records, summary = self._session().execute_read(_fetch_with_summary, query, params)
+        timings = {
+            "wall_ms": (time.perf_counter() - start_time) * 1000,
+            "available_after_ms": summary.result_available_after,
+            "consumed_after_ms": summary.result_consumed_after,
+            "records": len(records),
+        }
+        if profile and summary.profile:
+            timings["operators"] = _plan_operators(summary.profile)
+            timings["db_hits"] = sum(operator["db_hits"] for operator in timings["operators"])
+        return records, self.profiler.record(name, timings)
+
+    def _session(self):
+        """Return the session owned by the calling thread, opening it on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            if not self.driver:
+                raise RuntimeError("No active database connection")
+            session = self.driver.session()
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
     def clear_database(self):
         """Clear all data from the database"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return False
 
         try:
-            with self.driver.session() as session:
-                session.run("MATCH (n) DETACH DELETE n")
-                print("Database cleared")
-                return True
+            self._recommender = None
+            if self.graph is not None:
+                self.graph.clear()
+            else:
+                self.write("MATCH (n) DETACH DELETE n")
+            print("Database cleared")
+            return True
         except Exception as e:
             print(f"Failed to clear database: {e}")
             return False
 
-    def create_social_network(self):
+    def create_social_network(self, batch_size=DEFAULT_BATCH_SIZE):
         """Create a social network dataset"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return False
 
         try:
-            with self.driver.session() as session:
-                print("Creating social network dataset...")
-                session.run("""
-                    CREATE (alice:Person {name: 'Alice', age: 32, interests: ['Music', 'Travel', 'Reading']})
-                    CREATE (bob:Person {name: 'Bob', age: 35, interests: ['Sports', 'Music', 'Cooking']})
-                    CREATE (charlie:Person {name: 'Charlie', age: 28, interests: ['Travel', 'Photography']})
-                    CREATE (david:Person {name: 'David', age: 41, interests: ['Technology', 'Reading']})
-                    CREATE (emma:Person {name: 'Emma', age: 29, interests: ['Art', 'Music', 'Travel']})
-                    CREATE (frank:Person {name: 'Frank', age: 33, interests: ['Sports', 'Movies']})
-                    CREATE (grace:Person {name: 'Grace', age: 37, interests: ['Technology', 'Cooking']})
-                    // Create friendships
-                    CREATE (alice)-[:FRIEND {since: 2015}]->(bob)
-                    CREATE (alice)-[:FRIEND {since: 2018}]->(emma)
-                    CREATE (alice)-[:FRIEND {since: 2020}]->(grace)
-                    CREATE (bob)-[:FRIEND {since: 2012}]->(charlie)
-                    CREATE (bob)-[:FRIEND {since: 2019}]->(david)
-                    CREATE (charlie)-[:FRIEND {since: 2017}]->(emma)
-                    CREATE (charlie)-[:FRIEND {since: 2016}]->(frank)
-                    CREATE (david)-[:FRIEND {since: 2014}]->(grace)
-                    CREATE (emma)-[:FRIEND {since: 2021}]->(frank)
-                    CREATE (frank)-[:FRIEND {since: 2018}]->(grace)
-                    // Create locations
-                    CREATE (nyc:City {name: 'New York City'})
-                    CREATE (sf:City {name: 'San Francisco'})
-                    CREATE (la:City {name: 'Los Angeles'})
-                    CREATE (chicago:City {name: 'Chicago'})
-                    CREATE (boston:City {name: 'Boston'})
-                    // Create lived in relationships
-                    CREATE (alice)-[:LIVES_IN {since: 2010}]->(nyc)
-                    CREATE (bob)-[:LIVES_IN {since: 2015}]->(nyc)
-                    CREATE (charlie)-[:LIVES_IN {since: 2012}]->(sf)
-                    CREATE (david)-[:LIVES_IN {since: 2018}]->(la)
-                    CREATE (emma)-[:LIVES_IN {since: 2019}]->(chicago)
-                    CREATE (frank)-[:LIVES_IN {since: 2014}]->(boston)
-                    CREATE (grace)-[:LIVES_IN {since: 2017}]->(sf)
-                    // Create visit relationships
-                    CREATE (alice)-[:VISITED {year: 2019}]->(sf)
-                    CREATE (alice)-[:VISITED {year: 2021}]->(la)
-                    CREATE (bob)-[:VISITED {year: 2020}]->(chicago)
-                    CREATE (charlie)-[:VISITED {year: 2018}]->(nyc)
-                    CREATE (emma)-[:VISITED {year: 2021}]->(nyc)
-                    CREATE (emma)-[:VISITED {year: 2019}]->(sf)
-                    CREATE (frank)-[:VISITED {year: 2017}]->(la)
-                """)
-                print("Social network dataset created successfully")
-                return True
+            print("Creating social network dataset...")
+            self.load_dataset(SOCIAL_NETWORK, batch_size=batch_size)
+            print("Social network dataset created successfully")
+            return True
         except Exception as e:
             print(f"Failed to create social network: {e}")
             return False
 
-    def create_movie_network(self):
+    def create_movie_network(self, batch_size=DEFAULT_BATCH_SIZE):
         """Create a movie recommendation dataset"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return False
 
         try:
-            with self.driver.session() as session:
-                print("Creating movie network dataset...")
-                session.run("""
-                    // Create users
-                    CREATE (user1:User {name: 'User1', age: 25})
-                    CREATE (user2:User {name: 'User2', age: 34})
-                    CREATE (user3:User {name: 'User3', age: 29})
-                    CREATE (user4:User {name: 'User4', age: 42})
-                    CREATE (user5:User {name: 'User5', age: 31})
-                    
-                    // Create movies
-                    CREATE (inception:Movie {title: 'Inception', year: 2010, genre: 'Sci-Fi'})
-                    CREATE (darkKnight:Movie {title: 'The Dark Knight', year: 2008, genre: 'Action'})
-                    CREATE (matrix:Movie {title: 'The Matrix', year: 1999, genre: 'Sci-Fi'})
-                    CREATE (pulpFiction:Movie {title: 'Pulp Fiction', year: 1994, genre: 'Crime'})
-                    CREATE (forrestGump:Movie {title: 'Forrest Gump', year: 1994, genre: 'Drama'})
-                    CREATE (godfather:Movie {title: 'The Godfather', year: 1972, genre: 'Crime'})
-                    CREATE (interstellar:Movie {title: 'Interstellar', year: 2014, genre: 'Sci-Fi'})
-                    
-                    // Create actors
-                    CREATE (diCaprio:Actor {name: 'Leonardo DiCaprio'})
-                    CREATE (bale:Actor {name: 'Christian Bale'})
-                    CREATE (reeves:Actor {name: 'Keanu Reeves'})
-                    CREATE (travolta:Actor {name: 'John Travolta'})
-                    CREATE (jackson:Actor {name: 'Samuel L. Jackson'})
-                    CREATE (hanks:Actor {name: 'Tom Hanks'})
-                    CREATE (pacino:Actor {name: 'Al Pacino'})
-                    CREATE (mcConaughey:Actor {name: 'Matthew McConaughey'})
-                    
-                    // Create directors
-                    CREATE (nolan:Director {name: 'Christopher Nolan'})
-                    CREATE (wachowski:Director {name: 'Lana Wachowski'})
-                    CREATE (tarantino:Director {name: 'Quentin Tarantino'})
-                    CREATE (zemeckis:Director {name: 'Robert Zemeckis'})
-                    CREATE (coppola:Director {name: 'Francis Ford Coppola'})
-                    
-                    // Create acted_in relationships
-                    CREATE (diCaprio)-[:ACTED_IN]->(inception)
-                    CREATE (bale)-[:ACTED_IN]->(darkKnight)
-                    CREATE (reeves)-[:ACTED_IN]->(matrix)
-                    CREATE (travolta)-[:ACTED_IN]->(pulpFiction)
-                    CREATE (jackson)-[:ACTED_IN]->(pulpFiction)
-                    CREATE (hanks)-[:ACTED_IN]->(forrestGump)
-                    CREATE (pacino)-[:ACTED_IN]->(godfather)
-                    CREATE (mcConaughey)-[:ACTED_IN]->(interstellar)
-                    CREATE (diCaprio)-[:ACTED_IN]->(interstellar)
-                    
-                    // Create directed relationships
-                    CREATE (nolan)-[:DIRECTED]->(inception)
-                    CREATE (nolan)-[:DIRECTED]->(darkKnight)
-                    CREATE (nolan)-[:DIRECTED]->(interstellar)
-                    CREATE (wachowski)-[:DIRECTED]->(matrix)
-                    CREATE (tarantino)-[:DIRECTED]->(pulpFiction)
-                    CREATE (zemeckis)-[:DIRECTED]->(forrestGump)
-                    CREATE (coppola)-[:DIRECTED]->(godfather)
-                    
-                    // Create rated relationships - Complete ratings for all users
-                    CREATE (user1)-[:RATED {rating: 5}]->(inception)
-                    CREATE (user1)-[:RATED {rating: 4}]->(darkKnight)
-                    CREATE (user1)-[:RATED {rating: 5}]->(matrix)
-                    CREATE (user1)-[:RATED {rating: 3}]->(interstellar)
-                    
-                    CREATE (user2)-[:RATED {rating: 3}]->(inception)
-                    CREATE (user2)-[:RATED {rating: 5}]->(pulpFiction)
-                    CREATE (user2)-[:RATED {rating: 4}]->(godfather)
-                    
-                    CREATE (user3)-[:RATED {rating: 4}]->(inception)
-                    CREATE (user3)-[:RATED {rating: 5}]->(matrix)
-                    CREATE (user3)-[:RATED {rating: 4}]->(darkKnight)
-                    CREATE (user3)-[:RATED {rating: 3}]->(forrestGump)
-                    
-                    CREATE (user4)-[:RATED {rating: 5}]->(godfather)
-                    CREATE (user4)-[:RATED {rating: 4}]->(forrestGump)
-                    CREATE (user4)-[:RATED {rating: 3}]->(pulpFiction)
-                    
-                    CREATE (user5)-[:RATED {rating: 5}]->(interstellar)
-                    CREATE (user5)-[:RATED {rating: 4}]->(inception)
-                    CREATE (user5)-[:RATED {rating: 3}]->(matrix)
-                """)
-                print("Movie network dataset created successfully")
-                return True
+            print("Creating movie network dataset...")
+            self.load_dataset(MOVIE_NETWORK, batch_size=batch_size)
+            print("Movie network dataset created successfully")
+            return True
         except Exception as e:
             print(f"Failed to create movie network: {e}")
             return False
 
+    def load_dataset(self, dataset, batch_size=DEFAULT_BATCH_SIZE):
+        """Bulk-load a dataset of the form used by SOCIAL_NETWORK and MOVIE_NETWORK"""
+        # Constraints first, so the relationship MATCHes below are index seeks
+        self.schema.ensure(dataset)
+        for label, rows in dataset["nodes"].items():
+            self.load_nodes(label, rows, batch_size=batch_size)
+        for rel_type, start_label, end_label, rows in dataset["relationships"]:
+            self.load_relationships(rel_type, start_label, end_label, rows,
+                                    start_key=NODE_KEYS.get(start_label, "name"),
+                                    end_key=NODE_KEYS.get(end_label, "name"),
+                                    batch_size=batch_size)
+
+    def load_nodes(self, label, rows, batch_size=DEFAULT_BATCH_SIZE):
+        """Create one node per property dict in rows, sent in UNWIND batches"""
+        query = f"""
+            UNWIND $rows AS row
+            CREATE (n:{_identifier(label)})
+            SET n = row
+        """
+        if self.graph is not None:
+            start_time = time.perf_counter()
+            count = self.graph.add_nodes(label, rows)
+            return _load_stats(count, time.perf_counter() - start_time, f"{label} nodes")
+        return self._write_batches(query, rows, batch_size, f"{label} nodes")
+
+    def load_relationships(self, rel_type, start_label, end_label, rows,
+                           start_key="name", end_key="name", batch_size=DEFAULT_BATCH_SIZE):
+        """Create relationships between existing nodes, matched on their key properties.
+
+        Each row is either a dict with "start", "end" and optional "properties"
+        keys, or a (start, end[, properties]) tuple.
+        """
+        query = f"""
+            UNWIND $rows AS row
+            MATCH (a:{_identifier(start_label)} {{{_identifier(start_key)}: row.start}})
+            MATCH (b:{_identifier(end_label)} {{{_identifier(end_key)}: row.end}})
+            CREATE (a)-[r:{_identifier(rel_type)}]->(b)
+            SET r = row.properties
+        """
+        if rel_type == "RATED":
+            self._recommender = None
+        if self.graph is not None:
+            start_time = time.perf_counter()
+            count = self.graph.add_relationships(rel_type, start_label, end_label, rows,
+                                                 start_key=start_key, end_key=end_key)
+            return _load_stats(count, time.perf_counter() - start_time,
+                               f"{rel_type} relationships")
+        rows = (_relationship_row(row) for row in rows)
+        return self._write_batches(query, rows, batch_size, f"{rel_type} relationships")
+
+    def load_nodes_from_file(self, label, path, batch_size=DEFAULT_BATCH_SIZE):
+        """Bulk-load nodes from a CSV or Parquet file, one node per row"""
+        return self.load_nodes(label, _read_rows(path, batch_size), batch_size=batch_size)
+
+    def load_relationships_from_file(self, rel_type, start_label, end_label, path,
+                                     start_key="name", end_key="name",
+                                     batch_size=DEFAULT_BATCH_SIZE):
+        """Bulk-load relationships from a CSV or Parquet file.
+
+        The file needs "start" and "end" columns holding the key property of
+        each endpoint; every other column becomes a relationship property.
+        """
+        rows = ({"start": row.pop("start"), "end": row.pop("end"), "properties": row}
+                for row in _read_rows(path, batch_size))
+        return self.load_relationships(rel_type, start_label, end_label, rows,
+                                       start_key=start_key, end_key=end_key,
+                                       batch_size=batch_size)
+
+    @property
+    def recommender(self):
+        """RatingRecommender over every RATED relationship, built on first use"""
+        if self._recommender is None:
+            recommender = RatingRecommender()
+            if self.graph is not None:
+                recommender.add_ratings(self.graph.relationship_rows("RATED", "rating"))
+            else:
+                recommender.add_ratings((record["user"], record["title"], record["rating"])
+                                        for record in self.read(RATINGS_QUERY))
+            self._recommender = recommender
+        return self._recommender
+
+    def recommend_movies(self, user, n=3):
+        """Top n (title, predicted rating) recommendations from the in-memory index"""
+        return self.recommender.recommend(user, n)
+
+    def add_ratings(self, ratings, batch_size=DEFAULT_BATCH_SIZE):
+        """Store (user, title, rating) triples and fold them into the recommender incrementally"""
+        ratings = [tuple(rating) for rating in ratings]
+        if self.graph is not None:
+            self.graph.merge_relationships("RATED", "User", "Movie",
+                                           [(user, title, {"rating": rating})
+                                            for user, title, rating in ratings],
+                                           end_key=NODE_KEYS["Movie"])
+        else:
+            rows = [{"user": user, "title": title, "rating": rating}
+                    for user, title, rating in ratings]
+            self._write_batches(RATE_QUERY, rows, batch_size, "ratings")
+        if self._recommender is not None:
+            self._recommender.add_ratings(ratings)
+
+    def _write_batches(self, query, rows, batch_size, description):
+        """Run query once per batch of rows inside managed write transactions"""
+        if not self.driver:
+            raise RuntimeError("No active database connection")
+
+        count = 0
+        start_time = time.perf_counter()
+        session = self._session()
+        for batch in itertools.batched(rows, batch_size):
+            session.execute_write(_run_batch, query, list(batch))
+            count += len(batch)
+        return _load_stats(count, time.perf_counter() - start_time, description)
+
     def demo_benefit_1_relationships(self):
         """Demonstrate the benefit of handling relationships in graph databases"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return
 
         print("\n=== DEMO: BENEFIT 1 - NATURAL HANDLING OF RELATIONSHIPS ===")
         try:
-            with self.driver.session() as session:
-                print("\nFinding friends of friends for Alice (2nd degree connections):")
-                result = session.run("""
-                    MATCH (alice:Person {name: 'Alice'})-[:FRIEND]->(friend)-[:FRIEND]->(friendOfFriend)
-                    WHERE friendOfFriend <> alice
-                    RETURN DISTINCT friendOfFriend.name as name
-                """)
+            print("\nFinding friends of friends for Alice (2nd degree connections):")
+            if self.graph is not None:
+                friends_of_friends = self.graph.friends_of_friends("Alice")
+            else:
+                result = self.read(DEMO_QUERIES["friends_of_friends"])
                 friends_of_friends = [record["name"] for record in result]
-                print(f"Alice's friends of friends: {', '.join(friends_of_friends)}")
-
-                print("\nFinding movie recommendations based on similar user ratings:")
-                result = session.run("""
-                    MATCH (user:User {name: 'User1'})-[r1:RATED]->(movie1:Movie)
-                    MATCH (otherUser:User)-[r2:RATED]->(movie1)
-                    WHERE user <> otherUser AND abs(r1.rating - r2.rating) <= 1
-                    MATCH (otherUser)-[r3:RATED]->(recommendedMovie:Movie)
-                    WHERE NOT EXISTS((user)-[:RATED]->(recommendedMovie))
-                    RETURN DISTINCT recommendedMovie.title as title, AVG(r3.rating) as avgRating
-                    ORDER BY avgRating DESC
-                    LIMIT 3
-                """)
-                recommendations = [(record["title"], record["avgRating"]) for record in result]
-                print("Movie recommendations for User1:")
-                for movie, rating in recommendations:
-                    print(f"  - {movie} (Average rating: {rating:.1f})")
+            print(f"Alice's friends of friends: {', '.join(friends_of_friends)}")
+
+            print("\nFinding movie recommendations based on similar user ratings:")
+            recommendations = self.recommend_movies("User1", 3)
+            print("Movie recommendations for User1:")
+            for movie, rating in recommendations:
+                print(f"  - {movie} (Predicted rating: {rating:.1f})")
         except Exception as e:
             print(f"Error in demo_benefit_1: {e}")
 
     def demo_benefit_2_pattern_matching(self):
         """Demonstrate the benefit of pattern matching in graph databases"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return
 
         print("\n=== DEMO: BENEFIT 2 - COMPLEX PATTERN MATCHING ===")
         try:
-            with self.driver.session() as session:
-                print("\nFinding all actors who worked with director Christopher Nolan:")
-                result = session.run("""
-                    MATCH (actor:Actor)-[:ACTED_IN]->(:Movie)<-[:DIRECTED]-(director:Director {name: 'Christopher Nolan'})
-                    RETURN DISTINCT actor.name as name
-                """)
+            print("\nFinding all actors who worked with director Christopher Nolan:")
+            if self.graph is not None:
+                actors = self.graph.actors_with_director("Christopher Nolan")
+            else:
+                result = self.read(DEMO_QUERIES["actors_with_director"])
                 actors = [record["name"] for record in result]
-                print(f"Actors who worked with Christopher Nolan: {', '.join(actors)}")
-
-                print("\nFinding all people who live in one city but visited another:")
-                result = session.run("""
-                    MATCH (person:Person)-[:LIVES_IN]->(homeCity:City)
-                    MATCH (person)-[:VISITED]->(visitedCity:City)
-                    WHERE homeCity <> visitedCity
-                    RETURN person.name as name, homeCity.name as home, 
-                           collect(DISTINCT visitedCity.name) as visited
-                    ORDER BY name
-                """)
-                for record in result:
-                    visited_cities = ", ".join(record["visited"])
-                    print(f"{record['name']} lives in {record['home']} but visited {visited_cities}")
+            print(f"Actors who worked with Christopher Nolan: {', '.join(actors)}")
+
+            print("\nFinding all people who live in one city but visited another:")
+            if self.graph is not None:
+                rows = self.graph.lived_and_visited()
+            else:
+                result = self.read(DEMO_QUERIES["lived_and_visited"])
+                rows = [(record["name"], record["home"], record["visited"]) for record in result]
+            for name, home, visited in rows:
+                visited_cities = ", ".join(visited)
+                print(f"{name} lives in {home} but visited {visited_cities}")
         except Exception as e:
             print(f"Error in demo_benefit_2: {e}")
 
     def demo_benefit_3_performance(self):
         """Demonstrate the benefit of performance for connected data in graph databases"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return
 
         print("\n=== DEMO: BENEFIT 3 - PERFORMANCE FOR CONNECTED DATA ===")
         try:
-            with self.driver.session() as session:
-                print("\nFinding shortest path between two people:")
-
-                # Measure performance of a complex graph traversal
-                start_time = time.time()
-                result = session.run("""
-                    MATCH p=shortestPath((a:Person {name: 'Alice'})-[*]-(f:Person {name: 'Frank'}))
-                    RETURN [node in nodes(p) | coalesce(node.name, node.title)] AS path
-                """)
-                path_nodes = result.single()["path"]
-                duration = time.time() - start_time
-
-                print(f"Shortest path found in {duration:.6f} seconds:")
-                print(" -> ".join(path_nodes))
-
-                # Run a complex query that would be difficult in SQL
-                start_time = time.time()
-                result = session.run("""
-                    MATCH (person:Person)
-                    OPTIONAL MATCH (person)-[:FRIEND]->(friend:Person)
-                    WITH person, count(friend) as friendCount
-                    MATCH (person)-[:LIVES_IN]->(city:City)
-                    OPTIONAL MATCH (person)-[:VISITED]->(visitedCity:City)
-                    RETURN person.name as name, 
-                           friendCount,
-                           city.name as home,
-                           count(DISTINCT visitedCity) as citiesVisited
-                    ORDER BY friendCount DESC
-                """)
-                duration = time.time() - start_time
-
-                print(f"\nComplex social analysis completed in {duration:.6f} seconds:")
-                for record in result:
-                    print(f"{record['name']} has {record['friendCount']} friends, " +
-                          f"lives in {record['home']}, and visited {record['citiesVisited']} cities")
+            print("\nFinding shortest path between two people:")
+
+            # Measure performance of a complex graph traversal, including fetching every record
+            if self.graph is not None:
+                start_time = time.perf_counter()
+                path_nodes = self.graph.shortest_path("Person", "Alice", "Person", "Frank")
+                timings = self.profiler.record(
+                    "shortest_path", {"wall_ms": (time.perf_counter() - start_time) * 1000})
+            else:
+                result, timings = self.profile_query("shortest_path", DEMO_QUERIES["shortest_path"])
+                path_nodes = result[0]["path"]
+
+            print(f"Shortest path found in {timings['wall_ms'] / 1000:.6f} seconds:")
+            print(_describe_timings(timings))
+            print(" -> ".join(path_nodes))
+
+            # Run a complex query that would be difficult in SQL
+            if self.graph is not None:
+                start_time = time.perf_counter()
+                rows = self.graph.social_summary()
+                timings = self.profiler.record(
+                    "social_summary", {"wall_ms": (time.perf_counter() - start_time) * 1000})
+            else:
+                result, timings = self.profile_query("social_summary", DEMO_QUERIES["social_summary"], profile=True)
+                rows = [(record["name"], record["friendCount"], record["home"], record["citiesVisited"])
+                        for record in result]
+
+            print(f"\nComplex social analysis completed in {timings['wall_ms'] / 1000:.6f} seconds:")
+            print(_describe_timings(timings))
+            for name, friend_count, home, cities_visited in rows:
+                print(f"{name} has {friend_count} friends, " +
+                      f"lives in {home}, and visited {cities_visited} cities")
         except Exception as e:
             print(f"Error in demo_benefit_3: {e}")
 
     def demo_benefit_4_schema_flexibility(self):
         """Demonstrate the benefit of schema flexibility in graph databases"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return
 
         print("\n=== DEMO: BENEFIT 4 - SCHEMA FLEXIBILITY ===")
+        if self.graph is not None:
+            print("This demo writes Cypher and needs the neo4j backend")
+            return
+
         try:
-            with self.driver.session() as session:
-                # Add a new property to an existing node
-                print("\nAdding new properties to existing nodes:")
-                session.run("""
-                    MATCH (alice:Person {name: 'Alice'})
-                    SET alice.occupation = 'Software Engineer', 
-                        alice.languages = ['English', 'Spanish']
-                """)
-
-                # Create a new type of node and connect to existing nodes
-                print("Adding a new type of node (Event) with connections to existing nodes:")
-                session.run("""
-                    CREATE (conference:Event {
-                        name: 'Tech Conference 2023', 
-                        date: '2023-11-15', 
-                        location: 'San Francisco'
-                    })
-                    WITH conference
-                    MATCH (person:Person)
-                    WHERE person.name IN ['Alice', 'David', 'Grace']
-                    CREATE (person)-[:ATTENDED {role: CASE 
-                                                    WHEN person.name = 'Alice' THEN 'Speaker'
-                                                    WHEN person.name = 'David' THEN 'Organizer'
-                                                    ELSE 'Attendee' 
-                                                 END}]->(conference)
-                """)
-
-                # Query the new structure
-                result = session.run("""
-                    MATCH (person:Person)-[r:ATTENDED]->(event:Event)
-                    RETURN person.name as name, r.role as role, event.name as event
-                """)
-
-                print("\nPeople who attended the new event:")
-                for record in result:
-                    print(f"{record['name']} attended {record['event']} as a {record['role']}")
-
-                # Show all data types for a node
-                result = session.run("""
-                    MATCH (alice:Person {name: 'Alice'}) 
-                    RETURN alice
-                """)
-
-                alice_data = result.single()["alice"]
-                print("\nAlice's flexible schema with added properties:")
-                for key, value in alice_data.items():
-                    print(f"  - {key}: {value}")
+            # Add a new property to an existing node
+            print("\nAdding new properties to existing nodes:")
+            self.write(DEMO_QUERIES["add_properties"])
+
+            # Create a new type of node and connect to existing nodes
+            print("Adding a new type of node (Event) with connections to existing nodes:")
+            self.write(DEMO_QUERIES["add_event"])
+
+            # Query the new structure
+            result = self.read(DEMO_QUERIES["event_attendees"])
+
+            print("\nPeople who attended the new event:")
+            for record in result:
+                print(f"{record['name']} attended {record['event']} as a {record['role']}")
+
+            # Show all data types for a node
+            result = self.read(DEMO_QUERIES["person_node"])
+
+            alice_data = result[0]["alice"]
+            print("\nAlice's flexible schema with added properties:")
+            for key, value in alice_data.items():
+                print(f"  - {key}: {value}")
         except Exception as e:
             print(f"Error in demo_benefit_4: {e}")
 
     def demo_benefit_5_visualization(self):
         """Demonstrate the benefit of natural data visualization with graph databases"""
-        if not self.driver:
+        if not self.connected:
             print("No active database connection")
             return
 
         print("\n=== DEMO: BENEFIT 5 - NATURAL DATA VISUALIZATION ===")
         try:
-            # Create a NetworkX graph for visualization
-            G = nx.Graph()
-
-            # Get people and their friends
-            with self.driver.session() as session:
-                # Get all people
-                result = session.run("""
-                    MATCH (p:Person)
-                    RETURN p.name as name
-                """)
-                for record in result:
-                    G.add_node(record["name"], type="person")
-
-                # Get friendships
-                result = session.run("""
-                    MATCH (p1:Person)-[:FRIEND]->(p2:Person)
-                    RETURN p1.name as person1, p2.name as person2
-                """)
-                for record in result:
-                    G.add_edge(record["person1"], record["person2"], type="friend")
-
-                # Get cities
-                result = session.run("""
-                    MATCH (c:City)
-                    RETURN c.name as name
-                """)
-                for record in result:
-                    G.add_node(record["name"], type="city")
-
-                # Get lives_in relationships
-                result = session.run("""
-                    MATCH (p:Person)-[:LIVES_IN]->(c:City)
-                    RETURN p.name as person, c.name as city
-                """)
-                for record in result:
-                    G.add_edge(record["person"], record["city"], type="lives_in")
+            # Pull people, cities, friendships and lives_in relationships in one pass
+            export = self.export_graph(*DEMO_EXPORT)
 
             print("Building network visualization of people, their friendships, and cities...")
-
-            # Create node colors based on type
-            node_colors = []
-            for node in G.nodes():
-                if G.nodes[node].get("type") == "person":
-                    node_colors.append("skyblue")
-                else:
-                    node_colors.append("lightgreen")
-
-            # Create edge colors based on relationship type
-            edge_colors = []
-            for u, v in G.edges():
-                if G.edges[u, v].get("type") == "friend":
-                    edge_colors.append("gray")
-                else:
-                    edge_colors.append("red")
-
-            # Position nodes using a layout algorithm
-            pos = nx.spring_layout(G, seed=42)
-
             print("Network visualization is ready (would normally display a graph)")
             print("Graph contains:")
-            print(f"- {sum(1 for _, attr in G.nodes(data=True) if attr.get('type') == 'person')} people")
-            print(f"- {sum(1 for _, attr in G.nodes(data=True) if attr.get('type') == 'city')} cities")
-            print(f"- {sum(1 for _, _, attr in G.edges(data=True) if attr.get('type') == 'friend')} friendship relationships")
-            print(f"- {sum(1 for _, _, attr in G.edges(data=True) if attr.get('type') == 'lives_in')} lives_in relationships")
+            print(f"- {export.count_nodes('person')} people")
+            print(f"- {export.count_nodes('city')} cities")
+            print(f"- {export.count_edges('friend')} friendship relationships")
+            print(f"- {export.count_edges('lives_in')} lives_in relationships")
 
-            # In a real application, you would display this graph:
+            # In a real application, you would display this graph. The NetworkX
+            # graph and the spring layout are only computed on first access:
             """
+            G = export.graph
+            pos = export.layout
+
             plt.figure(figsize=(12, 10))
             
             # Draw nodes
-            nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=500)
+            nx.draw_networkx_nodes(G, pos, nodelist=export.node_names,
+                                   node_color=export.node_colors(), node_size=500)
             
             # Draw edges
-            nx.draw_networkx_edges(G, pos, edge_color=edge_colors, width=1.5)
+            nx.draw_networkx_edges(G, pos, edgelist=export.edge_list,
+                                   edge_color=export.edge_colors(), width=1.5)
             
             # Draw labels
             nx.draw_networkx_labels(G, pos, font_size=10)
@@ -458,8 +1359,21 @@ class GraphDatabaseDemo:
         except Exception as e:
             print(f"Error in demo_benefit_5: {e}")
 
-def run_demo():
-    """Run the complete Neo4j graph database demo"""
+    def export_graph(self, node_labels, rel_types, fetch_size=DEFAULT_FETCH_SIZE):
+        """Stream the nodes and relationships of the given labels and types into a GraphExport.
+
+        Neo4j is read with a single query whose records arrive fetch_size at a
+        time and are collected straight into columns; nothing is built per record.
+        """
+        if self.graph is not None:
+            return GraphExport(*self.graph.export(node_labels, rel_types))
+
+        with self.driver.session(fetch_size=fetch_size) as session:
+            columns = session.execute_read(_collect_export, export_query(node_labels, rel_types), {})
+        return GraphExport(*columns)
+
+def run_demo(backend="neo4j"):
+    """Run the complete Neo4j graph database demo ("memory" runs it without a server)"""
     # Connect to Neo4j
     demo = None
     try:
@@ -470,9 +1384,10 @@ def run_demo():
 
         print("Starting Neo4j Graph Database Demo")
         print("==================================")
-        print(f"Connecting to Neo4j at {uri}")
+        if backend == "neo4j":
+            print(f"Connecting to Neo4j at {uri}")
 
-        demo = GraphDatabaseDemo(uri, username, password)
+        demo = GraphDatabaseDemo(uri, username, password, backend=backend)
 
         # Clear existing data
         demo.clear_database()
@@ -498,5 +1413,19 @@ def run_demo():
         if demo:
             demo.close()
 
+def check_query_plans():
+    """Create the demo schema on the local Neo4j server and check every demo query plan"""
+    demo = GraphDatabaseDemo()
+    try:
+        demo.schema.ensure(SOCIAL_NETWORK)
+        demo.schema.ensure(MOVIE_NETWORK)
+        print("Checking demo query plans for label and all-node scans:")
+        flagged = demo.schema.check_plans()
+    finally:
+        demo.close()
+    return not flagged
+
 if __name__ == "__main__":
-    run_demo()
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        sys.exit(0 if check_query_plans() else 1)
+    run_demo(sys.argv[1] if len(sys.argv) > 1 else "neo4j")
@@ -1,16 +1,87 @@
 """
 https://docs.peewee-orm.com/en/latest/index.html
 """
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from peewee import chunked
+from peewee import DatabaseProxy
 from peewee import SqliteDatabase
 from peewee import Model
 from peewee import ForeignKeyField
 from peewee import CharField
 from peewee import DateTimeField
 from peewee import TextField
+from peewee import Tuple
+from peewee import Value
+from peewee import SQL
+from peewee import fn
+from playhouse.pool import PooledSqliteDatabase
+from playhouse.sqlite_ext import FTS5Model
+from playhouse.sqlite_ext import RowIDField
+from playhouse.sqlite_ext import SearchField
 
 DATABASE = 'test.db'
 
-database = SqliteDatabase(DATABASE)
+# Bound parameters SQLite accepts per statement: 32766 since 3.32.0, 999 before
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+# PRAGMA sets applied to every new connection. "default" keeps SQLite's own
+# settings (rollback journal, synchronous=FULL, ~2MB cache, no mmap).
+PROFILES = {
+    # SQLite's defaults, except that a locked database is waited on for up
+    # to busy_timeout ms instead of failing at once
+    'default': {
+        'busy_timeout': 5000,
+    },
+    # WAL lets readers run alongside the writer; every commit is still fsynced
+    'safe': {
+        'journal_mode': 'wal',
+        'synchronous': 'full',
+        'busy_timeout': 5000,
+    },
+    # WAL with fsync only at checkpoints: a power loss can drop the last
+    # commits but never corrupts the database
+    'fast': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64 * 1024,  # negative means KiB, so 64MB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+}
+
+# The models are bound to this proxy; use_database() decides what it points at
+database = DatabaseProxy()
+
+
+def make_database(path=DATABASE, profile='default', pooled=False, max_connections=16):
+    """Create a database for path with the named PRAGMA profile.
+
+    peewee already keeps one connection per thread; with pooled=True
+    connections are also returned to a pool on close() and reused by the
+    next thread instead of being reopened.
+    """
+    pragmas = PROFILES[profile]
+    if pooled:
+        return PooledSqliteDatabase(path, pragmas=pragmas, max_connections=max_connections,
+                                    stale_timeout=300, check_same_thread=False)
+    return SqliteDatabase(path, pragmas=pragmas)
+
+
+def use_database(path=DATABASE, profile='default', pooled=False, **kwargs):
+    """Point the models at a new database and return it"""
+    db = make_database(path, profile, pooled, **kwargs)
+    database.initialize(db)
+    return db
+
+
+use_database()
 
 
 class BaseModel(Model):
@@ -32,21 +103,282 @@ class Relationship(BaseModel):
     class Meta:
         indexes = (
             (('from_user', 'to_user'), True),
+            # followers of a user, for fanning out new messages
+            (('to_user', 'from_user'), False),
         )
 
 
 class Message(BaseModel):
-    user = ForeignKeyField(User, backref='messages')
+    # indexed by (user, pub_date) below rather than on its own
+    user = ForeignKeyField(User, backref='messages', index=False)
     content = TextField()
     pub_date = DateTimeField()
 
+    class Meta:
+        indexes = (
+            # newest messages per user without a sort (id is the rowid, so it is covered too)
+            (('user', 'pub_date'), False),
+        )
+
+
+class FeedEntry(BaseModel):
+    """Materialized timeline: one row per follower for every message posted"""
+    owner = ForeignKeyField(User, backref='feed', index=False)
+    message = ForeignKeyField(Message, index=False)
+    pub_date = DateTimeField()
+
+    class Meta:
+        indexes = (
+            (('owner', 'pub_date', 'message'), True),
+        )
+
+
+class MessageIndex(FTS5Model):
+    """FTS5 index over Message.content.
+
+    It is an external-content table: the text lives only in message, and
+    the SEARCH_TRIGGERS below keep the index in step with every insert,
+    update and delete.
+    """
+    rowid = RowIDField()
+    content = SearchField()
+
+    class Meta:
+        database = database
+        table_name = 'message_index'
+        options = {'content': 'message', 'content_rowid': 'id', 'tokenize': 'porter'}
+
+
+SEARCH_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS message_index_insert AFTER INSERT ON message BEGIN
+        INSERT INTO message_index (rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_index_delete AFTER DELETE ON message BEGIN
+        INSERT INTO message_index (message_index, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_index_update AFTER UPDATE OF content ON message BEGIN
+        INSERT INTO message_index (message_index, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO message_index (rowid, content) VALUES (new.id, new.content);
+    END""",
+)
+
 
 def create_tables():
     with database:
-        database.create_tables([User, Relationship, Message])
+        database.create_tables([User, Relationship, Message, FeedEntry, MessageIndex])
+        for trigger in SEARCH_TRIGGERS:
+            database.execute_sql(trigger)
+
+
+def rebuild_search_index():
+    """Re-index every message, e.g. for messages written before the triggers existed"""
+    MessageIndex.rebuild()
+
+
+def search_messages(term, page=1, per_page=20):
+    """Messages matching an FTS5 query, best bm25 score first.
+
+    Each message carries .score (lower is better) and .snippet, the
+    matching fragment with hits wrapped in [brackets].
+    """
+    return list(Message
+                .select(Message,
+                        MessageIndex.bm25().alias('score'),
+                        fn.snippet(MessageIndex._meta.entity, 0, '[', ']', '...', 12).alias('snippet'))
+                .join(MessageIndex, on=(MessageIndex.rowid == Message.id))
+                .where(MessageIndex.match(term))
+                .order_by(SQL('score'))
+                .paginate(page, per_page))
+
+
+def post_message(user, content, pub_date=None, fan_out=True):
+    """Create a message and, with fan_out, copy it into every follower's FeedEntry timeline"""
+    pub_date = pub_date or datetime.datetime.now()
+    with database.atomic():
+        message = Message.create(user=user, content=content, pub_date=pub_date)
+        if fan_out:
+            followers = (Relationship
+                         .select(Relationship.from_user, Value(message.id), Value(pub_date))
+                         .where(Relationship.to_user == user))
+            FeedEntry.insert_from(
+                followers, [FeedEntry.owner, FeedEntry.message, FeedEntry.pub_date]).execute()
+    return message
+
+
+def rebuild_feeds():
+    """Recreate every FeedEntry from Relationship and Message, e.g. after a bulk load"""
+    with database.atomic():
+        FeedEntry.delete().execute()
+        entries = (Relationship
+                   .select(Relationship.from_user, Message.id, Message.pub_date)
+                   .join(Message, on=(Message.user == Relationship.to_user)))
+        FeedEntry.insert_from(
+            entries, [FeedEntry.owner, FeedEntry.message, FeedEntry.pub_date]).execute()
+
+
+def feed(user, limit=20, cursor=None, materialized=False):
+    """Newest messages from the users that user follows, one keyset page at a time.
+
+    cursor is the (pub_date, id) of the last message of the previous page,
+    so every page is an index range scan however deep it is. With
+    materialized the page is read from FeedEntry instead of joining through
+    Relationship. Returns (messages, next_cursor); next_cursor is None on
+    the last page.
+    """
+    if materialized:
+        query = (Message
+                 .select(Message, User)
+                 .join(FeedEntry, on=(FeedEntry.message == Message.id))
+                 .switch(Message)
+                 .join(User)
+                 .where(FeedEntry.owner == user)
+                 .order_by(FeedEntry.pub_date.desc(), FeedEntry.message.desc()))
+        position = Tuple(FeedEntry.pub_date, FeedEntry.message)
+    else:
+        query = (Message
+                 .select(Message, User)
+                 .join(Relationship, on=(Relationship.to_user == Message.user))
+                 .switch(Message)
+                 .join(User)
+                 .where(Relationship.from_user == user)
+                 .order_by(Message.pub_date.desc(), Message.id.desc()))
+        position = Tuple(Message.pub_date, Message.id)
+    if cursor is not None:
+        query = query.where(position < Tuple(*cursor))
+
+    messages = list(query.limit(limit))
+    next_cursor = None
+    if len(messages) == limit:
+        next_cursor = (messages[-1].pub_date, messages[-1].id)
+    return messages, next_cursor
+
+
+def bulk_insert(model, fields, rows):
+    """Insert tuples of field values with insert_many, as many per statement as SQLite allows.
+
+    Each statement runs in its own transaction. Returns the row count,
+    elapsed seconds and rows/sec.
+    """
+    batch_size = max(1, SQLITE_MAX_VARIABLES // len(fields))
+    count = 0
+    start = time.perf_counter()
+    for batch in chunked(rows, batch_size):
+        with database.atomic():
+            model.insert_many(batch, fields=fields).execute()
+        count += len(batch)
+    duration = time.perf_counter() - start
+    rate = count / duration if duration > 0 else float('inf')
+    print(f"Inserted {count} {model.__name__} rows in {duration:.3f}s ({rate:,.0f} rows/sec)")
+    return {'count': count, 'seconds': duration, 'per_second': rate}
+
+
+def user_ids():
+    """Map of username -> id for every user, used to resolve foreign keys in bulk loads"""
+    return dict(User.select(User.username, User.id).tuples())
+
+
+def bulk_load_users(rows):
+    """Insert (username, password, email, join_date) tuples"""
+    return bulk_insert(User, [User.username, User.password, User.email, User.join_date], rows)
+
+
+def bulk_load_relationships(pairs, ids=None):
+    """Insert (from_username, to_username) pairs, resolving usernames through ids"""
+    ids = ids if ids is not None else user_ids()
+    rows = ((ids[from_user], ids[to_user]) for from_user, to_user in pairs)
+    return bulk_insert(Relationship, [Relationship.from_user, Relationship.to_user], rows)
+
+
+def bulk_load_messages(rows, ids=None):
+    """Insert (username, content, pub_date) tuples, resolving usernames through ids"""
+    ids = ids if ids is not None else user_ids()
+    rows = ((ids[username], content, pub_date) for username, content, pub_date in rows)
+    return bulk_insert(Message, [Message.user, Message.content, Message.pub_date], rows)
+
+
+def benchmark_profiles(threads=4, operations=2000, path='bench.db', pooled=True):
+    """Measure write and read throughput of every profile with threads concurrent workers.
+
+    One thread writes single-message transactions while the others read a
+    random user's latest messages. Each profile runs against a fresh
+    database file. Rates only count operations that succeeded; failed ones
+    (e.g. "database is locked") are reported under errors. Returns one
+    result dict per profile.
+    """
+    results = []
+    for profile in PROFILES:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        use_database(path, profile, pooled=pooled, max_connections=threads)
+        create_tables()
+        bulk_load_users((f'user{i}', 'pw', f'user{i}@example.com', datetime.datetime.now())
+                        for i in range(100))
+        ids = list(user_ids().values())
+        database.close()  # hand the setup connection back before the workers start
+
+        # Per worker: seconds taken, operations completed and operations failed
+        timings, completed, errors = {}, {}, {}
+
+        def run(name, operation):
+            completed[name] = errors[name] = 0
+            with database.connection_context():
+                start = time.perf_counter()
+                for i in range(operations):
+                    try:
+                        operation(i)
+                        completed[name] += 1
+                    except Exception as e:
+                        errors[name] += 1
+                        if errors[name] == 1:
+                            print(f"{profile}: {name} failed: {e}")
+                timings[name] = time.perf_counter() - start
+
+        def write(i):
+            with database.atomic():
+                Message.create(user=random.choice(ids), content=f'message {i}',
+                               pub_date=datetime.datetime.now())
+
+        def read(i):
+            list(Message.select().where(Message.user == random.choice(ids))
+                 .order_by(Message.pub_date.desc()).limit(10))
+
+        workers = [threading.Thread(target=run, args=('write', write))]
+        workers += [threading.Thread(target=run, args=(f'read{n}', read)) for n in range(threads - 1)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        readers = [name for name in timings if name.startswith('read')]
+        reads = sum(completed[name] for name in readers)
+        read_time = max((timings[name] for name in readers), default=0)
+        write_time = timings.get('write', 0)
+        result = {
+            'profile': profile,
+            'threads': threads,
+            'writes': completed.get('write', 0),
+            'reads': reads,
+            'errors': sum(errors.values()),
+            'writes_per_sec': completed.get('write', 0) / write_time if write_time else 0.0,
+            'reads_per_sec': reads / read_time if read_time else 0.0,
+        }
+        print(f"{profile:>8}: {result['writes_per_sec']:>10,.0f} writes/sec "
+              f"{result['reads_per_sec']:>10,.0f} reads/sec ({threads} threads, "
+              f"{result['errors']} errors)")
+        results.append(result)
+        if pooled:
+            database.close_all()
+
+    use_database()
+    return results
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark_profiles()
+        sys.exit(0)
+
     create_tables()
     try:
         with database.atomic():
@@ -1,35 +1,224 @@
 # pip install pyspark
 
 import os
+import numpy as np
+import pandas as pd
 from pyspark.sql import SparkSession
+from pyspark.sql.types import DoubleType, IntegerType, LongType, StringType, StructField, StructType
 from pyspark.sql.functions import col, expr, avg, desc, count
+from pyspark import StorageLevel
+from pyspark.ml import PipelineModel
 from pyspark.ml.feature import VectorAssembler
 from pyspark.ml.regression import LinearRegression
 
+CORES = os.cpu_count() or 1
+
+DATA = "spark_data"
+EMPLOYEES = DATA + "/employees"
+FEATURES = DATA + "/features"
+MODELS = DATA + "/models"
+
+# LinearRegression's normal-equation solver is exact and needs one pass over
+# the data, but only up to this many features; beyond it l-bfgs is used
+NORMAL_SOLVER_MAX_FEATURES = 4096
+
+# Explicit schemas, so nothing is inferred from the data on read or write
+EMPLOYEE_SCHEMA = StructType([
+    StructField("id", LongType(), False),
+    StructField("name", StringType(), True),
+    StructField("age", IntegerType(), True),
+    StructField("salary", DoubleType(), True),
+])
+
+FEATURE_SCHEMA = StructType([
+    StructField("feature", DoubleType(), False),
+    StructField("label", DoubleType(), False),
+])
+
+# Settings every session gets
+BASE_CONFIG = {
+    "spark.driver.extraJavaOptions": "-Dderby.system.home=/tmp/derby",
+    "spark.sql.legacy.allowNonEmptyLocationInCTAS": "true",
+}
+
+_TUNED = {
+    # pandas <-> Spark conversion through Arrow instead of pickled rows
+    "spark.sql.execution.arrow.pyspark.enabled": "true",
+    "spark.sql.execution.arrow.pyspark.fallback.enabled": "true",
+    # Adaptive execution: coalesce small shuffle partitions, split skewed joins
+    "spark.sql.adaptive.enabled": "true",
+    "spark.sql.adaptive.coalescePartitions.enabled": "true",
+    "spark.sql.adaptive.skewJoin.enabled": "true",
+    "spark.serializer": "org.apache.spark.serializer.KryoSerializer",
+    "spark.kryoserializer.buffer.max": "512m",
+}
+
+# Named sets of settings for get_spark(). The default 200 shuffle partitions
+# are far too many for small jobs, so the tuned profiles size them to the cores.
+PROFILES = {
+    # Spark's own defaults
+    'default': {},
+    # Small and medium jobs on one machine
+    'local': {
+        **_TUNED,
+        "spark.sql.shuffle.partitions": str(2 * CORES),
+        "spark.driver.memory": "4g",
+    },
+    # Large batch jobs: more, larger partitions and more driver memory
+    'large': {
+        **_TUNED,
+        "spark.sql.shuffle.partitions": str(4 * CORES),
+        "spark.sql.adaptive.advisoryPartitionSizeInBytes": "128m",
+        "spark.driver.memory": "8g",
+        "spark.driver.maxResultSize": "2g",
+    },
+}
+
+_session = None
+_session_profile = None
+
+
+def get_spark(profile='local', app_name="PySpark Example", master="local[*]", config=None):
+    """The process's SparkSession, started with the named profile on first use.
+
+    Later calls return the same session, so the JVM starts once per process
+    however many jobs run. config overrides settings by key, e.g.
+    {"spark.driver.memory": "16g"}. Settings
+    that need a restart (memory, serializer) only take effect on the first
+    call; runtime SQL settings are applied to the running session too.
+    """
+    global _session, _session_profile
+    settings = {**BASE_CONFIG, **PROFILES[profile],
+                **{key: str(value) for key, value in (config or {}).items()}}
+
+    if _session is not None and _session.sparkContext._jsc is not None:
+        for key, value in settings.items():
+            if _session.conf.isModifiable(key):
+                _session.conf.set(key, value)
+        if profile != _session_profile:
+            print(f"Reusing the Spark session started with profile {_session_profile}; "
+                  f"only the runtime settings of {profile} were applied")
+        return _session
+
+    os.environ.setdefault('PYSPARK_PYTHON', 'python')
+    os.environ.setdefault('PYTHONWARNINGS', 'ignore::DeprecationWarning')
+    builder = SparkSession.builder.appName(app_name).master(master)
+    for key, value in settings.items():
+        builder = builder.config(key, value)
+    _session = builder.getOrCreate()
+    _session_profile = profile
+    return _session
+
+
+def stop_spark():
+    """Stop the shared session, e.g. at the end of a pipeline"""
+    global _session, _session_profile
+    if _session is not None:
+        _session.stop()
+        _session = _session_profile = None
+
+
+def write_parquet(df, path, partition_by=None, mode="overwrite"):
+    """Write df as zstd-compressed Parquet, one directory per value of the partition_by columns"""
+    writer = df.write.mode(mode).option("compression", "zstd")
+    if partition_by:
+        writer = writer.partitionBy(*partition_by)
+    writer.parquet(path)
+
+
+def read_parquet(spark, path, schema, columns=None, where=None):
+    """DataFrame over Parquet files with a known schema.
+
+    Only the named columns are read from disk, and the where condition is
+    pushed down to the Parquet reader: row groups whose statistics rule it
+    out are skipped, and conditions on partition columns skip whole
+    directories. df.explain() lists them under PushedFilters and
+    PartitionFilters.
+    """
+    df = spark.read.schema(schema).parquet(path)
+    if where is not None:
+        df = df.filter(where)
+    if columns:
+        df = df.select(*columns)
+    return df
+
+
+def from_pandas(spark, pdf, schema):
+    """DataFrame from a pandas DataFrame, shipped to the JVM as Arrow batches.
+
+    Needs a profile with Arrow enabled (see PROFILES); with the schema given
+    nothing is inferred from the data.
+    """
+    return spark.createDataFrame(pdf, schema=schema)
+
+
+def from_numpy(spark, arrays, schema):
+    """DataFrame from {column: NumPy array}, sent via Arrow.
+
+    The pandas frame is built with copy=False, so its columns are views of
+    the arrays (by default pandas copies a dict of arrays into its own
+    blocks); the only copy is the Arrow serialisation itself.
+    """
+    pdf = pd.DataFrame({field.name: arrays[field.name] for field in schema.fields}, copy=False)
+    return from_pandas(spark, pdf, schema)
+
+
+def train_regression(df, feature_cols, label_col="label", partitions=None,
+                     storage_level=StorageLevel.MEMORY_AND_DISK, **params):
+    """Fitted PipelineModel of a VectorAssembler over feature_cols plus a LinearRegression.
+
+    The assembled features are repartitioned (by default to twice the
+    cores) and persisted, so every pass the solver makes reads the cached
+    vectors instead of re-reading and re-assembling the source. The solver
+    is chosen from the number of features; params go to LinearRegression.
+    """
+    assembler = VectorAssembler(inputCols=feature_cols, outputCol="features")
+    solver = "normal" if len(feature_cols) <= NORMAL_SOLVER_MAX_FEATURES else "l-bfgs"
+    lr = LinearRegression(featuresCol="features", labelCol=label_col, solver=solver, **params)
+
+    assembled = assembler.transform(df.select(*feature_cols, label_col)) \
+        .select("features", label_col) \
+        .repartition(partitions or 2 * CORES) \
+        .persist(storage_level)
+    try:
+        lr_model = lr.fit(assembled)
+    finally:
+        assembled.unpersist()
+    return PipelineModel(stages=[assembler, lr_model])
+
+
+def save_model(model, path):
+    model.write().overwrite().save(path)
+
+
+def load_model(path):
+    """A saved PipelineModel, ready to score with model.transform(df)"""
+    return PipelineModel.load(path)
+
+
+def fit_or_load(df, feature_cols, path, label_col="label", **params):
+    """The model saved at path, training and saving it first if there is none"""
+    if os.path.exists(path):
+        return load_model(path)
+    model = train_regression(df, feature_cols, label_col, **params)
+    save_model(model, path)
+    return model
+
+
 def main():
-    os.environ['PYSPARK_PYTHON'] = 'python'
-    os.environ['PYTHONWARNINGS'] = 'ignore::DeprecationWarning'
-    
-    spark = SparkSession.builder \
-        .appName("PySpark Example") \
-        .master("local[*]") \
-        .config("spark.driver.extraJavaOptions", "-Dderby.system.home=/tmp/derby") \
-        .config("spark.sql.legacy.allowNonEmptyLocationInCTAS", "true") \
-        .getOrCreate()
+    spark = get_spark()
     
     print("Spark session created successfully!")
     
     print("\n--- Creating a simple DataFrame ---")
-    data = [
-        (1, "John", 28, 5000.0),
-        (2, "Anna", 34, 6000.0),
-        (3, "Bob", 45, 7500.0),
-        (4, "Maria", 37, 8000.0),
-        (5, "David", 42, 7200.0)
-    ]
-    
-    columns = ["id", "name", "age", "salary"]
-    df = spark.createDataFrame(data, columns)
+    employees = pd.DataFrame({
+        "id": np.arange(1, 6, dtype=np.int64),
+        "name": ["John", "Anna", "Bob", "Maria", "David"],
+        "age": np.array([28, 34, 45, 37, 42], dtype=np.int32),
+        "salary": [5000.0, 6000.0, 7500.0, 8000.0, 7200.0],
+    })
+    write_parquet(from_pandas(spark, employees, EMPLOYEE_SCHEMA), EMPLOYEES, partition_by=["age"])
+    df = read_parquet(spark, EMPLOYEES, EMPLOYEE_SCHEMA)
     
     print("\n--- Original DataFrame ---")
     df.show()
@@ -40,7 +229,9 @@ def main():
     df.select("name", "age").show()
     
     print("Filtering data (age > 35):")
-    df.filter(col("age") > 35).show()
+    seniors = read_parquet(spark, EMPLOYEES, EMPLOYEE_SCHEMA, columns=["name", "age"], where=col("age") > 35)
+    seniors.explain()
+    seniors.show()
     
     print("Adding a new column (salary_after_raise):")
     df_with_raise = df.withColumn("salary_after_raise", col("salary") * 1.1)
@@ -57,25 +248,15 @@ def main():
     
     print("\n--- Simple ML example with MLlib ---")
     
-    ml_data = [
-        (1.0, 4.5),
-        (2.0, 6.0),
-        (3.0, 7.5),
-        (4.0, 9.0),
-        (5.0, 10.5)
-    ]
-    ml_df = spark.createDataFrame(ml_data, ["feature", "label"])
-    
-    assembler = VectorAssembler(
-        inputCols=["feature"],
-        outputCol="features")
-    
-    ml_transformed = assembler.transform(ml_df)
-    ml_transformed.show()
+    feature = np.arange(1.0, 6.0)
+    write_parquet(from_numpy(spark, {"feature": feature, "label": 1.5 * feature + 3.0}, FEATURE_SCHEMA), FEATURES)
+    ml_df = read_parquet(spark, FEATURES, FEATURE_SCHEMA)
     
-    lr = LinearRegression(featuresCol="features", labelCol="label", 
-                          maxIter=5, regParam=0.0)
-    lr_model = lr.fit(ml_transformed)
+    model = train_regression(ml_df, ["feature"], "label", maxIter=5, regParam=0.0)
+    save_model(model, MODELS + "/linear_regression")
+    model = load_model(MODELS + "/linear_regression")
+    model.transform(ml_df).show()
+    lr_model = model.stages[-1]
     
     print(f"Coefficients: {lr_model.coefficients}")
     print(f"Intercept: {lr_model.intercept}")
@@ -86,7 +267,7 @@ def main():
     
     spark.sql("SELECT name, age, salary FROM employees WHERE salary > 6000").show()
     
-    spark.stop()
+    stop_spark()
     print("\nSpark session stopped!")
 
 if __name__ == "__main__":
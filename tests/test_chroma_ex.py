@@ -0,0 +1,62 @@
+import uuid
+
+import chromadb
+import numpy as np
+import pytest
+
+from harpreet.chroma_ex import EmbeddingCache, Ingester, content_hash
+
+
+def fake_embedding(documents, dim=8):
+    """Deterministic vectors derived from each document's hash"""
+    return np.stack([np.random.default_rng(int(content_hash(document)[:8], 16)).random(dim, dtype=np.float32)
+                     for document in documents])
+
+
+@pytest.fixture
+def collection():
+    client = chromadb.EphemeralClient()
+    name = f"test_{uuid.uuid4().hex}"
+    yield client.create_collection(name=name, embedding_function=None)
+    client.delete_collection(name)
+
+
+def test_concurrent_ingest_stores_each_documents_own_vector(collection, tmp_path):
+    documents = [(f"id{i}", f"document number {i}") for i in range(2000)]
+    cache = EmbeddingCache(tmp_path)
+
+    stats = Ingester(collection, fake_embedding, cache=cache, batch_size=50, workers=4).ingest(documents)
+
+    assert stats["upserted"] == stats["embedded"] == len(documents)
+    stored = collection.get(ids=[doc_id for doc_id, _ in documents], include=["embeddings", "documents"])
+    by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    expected = fake_embedding([document for _, document in documents])
+    np.testing.assert_allclose([by_id[doc_id] for doc_id, _ in documents], expected)
+
+    reopened = EmbeddingCache(tmp_path)
+    assert len(reopened) == len(documents)
+    np.testing.assert_allclose(reopened.get([content_hash(document) for _, document in documents]), expected)
+
+
+def test_reingest_skips_unchanged_documents(collection, tmp_path):
+    documents = [(f"id{i}", f"document number {i}") for i in range(100)]
+    ingester = Ingester(collection, fake_embedding, cache=EmbeddingCache(tmp_path), batch_size=30, workers=2)
+    ingester.ingest(documents)
+
+    stats = ingester.ingest(documents[:50] + [("id50", "a changed document")])
+
+    assert stats["unchanged"] == 50
+    assert stats["upserted"] == stats["embedded"] == 1
+
+
+def test_put_numbers_rows_from_the_vectors_file(tmp_path):
+    cache = EmbeddingCache(tmp_path)
+    cache.put(["a"], fake_embedding(["a"]))
+    # Rows appended by a run that crashed before recording them, then half a row
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(fake_embedding(["x", "y"]).tobytes() + b"\0" * 12)
+
+    cache.put(["b", "c"], fake_embedding(["b", "c"]))
+
+    reopened = EmbeddingCache(tmp_path)
+    np.testing.assert_allclose(reopened.get(["a", "b", "c"]), fake_embedding(["a", "b", "c"]))
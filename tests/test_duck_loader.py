@@ -0,0 +1,78 @@
+import pytest
+
+from harpreet import duck_loader
+from harpreet.duck_loader import DuckLoader
+
+SCHEMA = {"city": "VARCHAR", "population": "BIGINT"}
+
+
+def write_csv(path, rows):
+    path.write_text("city,population\n" + "".join(f"{city},{population}\n" for city, population in rows))
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    """Paths of the CSVs parsed into Parquet, i.e. the Parquet cache misses"""
+    parsed = []
+    read_csv_sql = duck_loader._read_csv_sql
+
+    def spy(path, schema=None):
+        parsed.append(path)
+        return read_csv_sql(path, schema)
+
+    monkeypatch.setattr(duck_loader, "_read_csv_sql", spy)
+    return parsed
+
+
+def row_count(loader, table="cities"):
+    return loader.con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+
+def test_ingest_loads_new_files_and_reuses_the_parquet_cache(tmp_path, conversions):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_csv(data / "a.csv", [("Paris", 2_100_000), ("Lyon", 520_000)])
+    write_csv(data / "b.csv", [("Rome", 2_800_000)])
+    loader = DuckLoader(cache_dir=tmp_path / "cache")
+    pattern = str(data / "*.csv")
+
+    assert loader.ingest(pattern, "cities", SCHEMA) == 2
+    assert row_count(loader) == 3
+    assert len(conversions) == 2
+
+    assert loader.ingest(pattern, "cities", SCHEMA) == 0
+    assert row_count(loader) == 3
+    assert len(conversions) == 2
+
+    write_csv(data / "c.csv", [("Oslo", 700_000), ("Bergen", 290_000)])
+    assert loader.ingest(pattern, "cities", SCHEMA) == 1
+    assert row_count(loader) == 5
+    assert [path.rsplit("/", 1)[-1] for path in conversions] == ["a.csv", "b.csv", "c.csv"]
+
+    # A new loader over the same cache directory still parses nothing twice
+    fresh = DuckLoader(cache_dir=tmp_path / "cache")
+    assert fresh.ingest(pattern, "cities", SCHEMA) == 3
+    assert row_count(fresh) == 5
+    assert len(conversions) == 3
+
+
+def test_changed_file_is_reported_or_replaced(tmp_path, conversions):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_csv(data / "a.csv", [("Paris", 2_100_000)])
+    write_csv(data / "b.csv", [("Rome", 2_800_000)])
+    loader = DuckLoader(cache_dir=tmp_path / "cache")
+    pattern = str(data / "*.csv")
+    loader.ingest(pattern, "cities", SCHEMA)
+
+    write_csv(data / "b.csv", [("Rome", 2_800_000), ("Milan", 1_400_000)])
+    write_csv(data / "c.csv", [("Oslo", 700_000)])
+    with pytest.raises(ValueError, match="b.csv"):
+        loader.ingest(pattern, "cities", SCHEMA)
+    assert row_count(loader) == 2
+
+    assert loader.ingest(pattern, "cities", SCHEMA, replace=True) == 3
+    assert sorted(loader.con.execute("SELECT city FROM cities").fetchall()) == [
+        ("Milan",), ("Oslo",), ("Paris",), ("Rome",)]
+    assert loader.ingest(pattern, "cities", SCHEMA) == 0
+    assert [path.rsplit("/", 1)[-1] for path in conversions] == ["a.csv", "b.csv", "b.csv", "c.csv"]
@@ -0,0 +1,85 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from harpreet.graph_ex import Graph, random_social_graph
+
+
+def random_graph(directed, nodes=300, edges=1500, seed=0):
+    """(Graph, NetworkX graph) with the same random edges, self-loops and repeats included"""
+    rng = np.random.default_rng(seed)
+    sources, targets = rng.integers(nodes, size=edges), rng.integers(nodes, size=edges)
+    G = nx.DiGraph() if directed else nx.Graph()
+    G.add_nodes_from(range(nodes))
+    G.add_edges_from(zip(sources.tolist(), targets.tolist()))
+    sources, targets = np.array(list(G.edges)).T
+    return Graph.from_edges(sources, targets, names=np.arange(nodes), directed=directed), G
+
+
+@pytest.fixture(params=[False, True], ids=["undirected", "directed"])
+def graphs(request):
+    return random_graph(request.param)
+
+
+def test_edge_count(graphs):
+    graph, G = graphs
+    assert graph.node_count == G.number_of_nodes()
+    assert graph.edge_count == G.number_of_edges()
+
+
+def test_bfs(graphs):
+    graph, G = graphs
+    for source in (0, 17, 299):
+        expected = np.full(graph.node_count, -1)
+        for node, distance in nx.single_source_shortest_path_length(G, source).items():
+            expected[node] = distance
+        np.testing.assert_array_equal(graph.bfs(source), expected)
+
+
+def test_k_hop(graphs):
+    graph, G = graphs
+    for k in (1, 2, 3):
+        expected = set(nx.single_source_shortest_path_length(G, 5, cutoff=k)) - {5}
+        assert set(graph.k_hop(5, k)) == expected
+
+
+def test_shortest_path(graphs):
+    graph, G = graphs
+    for source, target in [(0, 1), (3, 250), (42, 42), (299, 7)]:
+        path = graph.shortest_path(source, target)
+        if not nx.has_path(G, source, target):
+            assert path is None
+            continue
+        assert path[0] == source and path[-1] == target
+        assert len(path) - 1 == nx.shortest_path_length(G, source, target)
+        assert all(G.has_edge(a, b) for a, b in zip(path, path[1:]))
+
+
+def test_shortest_path_unreachable():
+    graph = Graph.from_edges([0, 2], [1, 3], names=np.arange(4), directed=True)
+    assert graph.shortest_path(0, 3) is None
+    assert graph.shortest_path(1, 0) is None
+
+
+def test_pagerank(graphs):
+    graph, G = graphs
+    expected = nx.pagerank(G, tol=1e-10)
+    ranks = graph.pagerank(tolerance=1e-12)
+    np.testing.assert_allclose(ranks.to_numpy(), [expected[node] for node in ranks.index], atol=1e-8)
+
+
+def test_triangles(graphs):
+    graph, G = graphs
+    undirected = G.to_undirected()
+    undirected.remove_edges_from(nx.selfloop_edges(undirected))
+    expected = nx.triangles(undirected)
+    triangles = graph.triangles(block=64)  # several blocks, so partial products are summed
+    assert triangles.to_dict() == expected
+    assert graph.triangle_count() == sum(expected.values()) // 3
+
+
+def test_networkx_round_trip():
+    graph = random_social_graph(nodes=500, average_degree=6)
+    back = Graph.from_networkx(graph.to_networkx())
+    assert back.edge_count == graph.edge_count
+    np.testing.assert_array_equal(np.sort(back.out_degree()), np.sort(graph.out_degree()))
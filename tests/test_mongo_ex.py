@@ -0,0 +1,53 @@
+import pytest
+
+from harpreet.mongo_ex import USER_QUERIES, check_query_plans, plan_problems, remove_duplicate_names
+
+
+def explain(winning_plan, returned=1, examined=1):
+    """A minimal executionStats explain document"""
+    return {"queryPlanner": {"winningPlan": winning_plan},
+            "executionStats": {"nReturned": returned, "totalDocsExamined": examined}}
+
+
+INDEXED = explain({"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "name_unique"}})
+
+
+def test_collscan_is_flagged():
+    assert plan_problems(explain({"stage": "COLLSCAN"})) == ["COLLSCAN"]
+
+
+def test_sbe_plan_nested_under_query_plan_is_searched():
+    sbe = explain({"queryPlan": {"stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "COLLSCAN"}},
+                   "slotBasedPlan": {"slots": "...", "stages": "..."}})
+    assert plan_problems(sbe) == ["COLLSCAN"]
+    assert plan_problems(explain({"queryPlan": INDEXED["queryPlanner"]["winningPlan"]})) == []
+
+
+def test_examined_to_returned_ratio_is_flagged():
+    plan = INDEXED["queryPlanner"]["winningPlan"]
+    assert plan_problems(explain(plan, returned=2, examined=20)) == []
+    assert plan_problems(explain(plan, returned=2, examined=21)) == ["examined 21 documents for 2"]
+    assert plan_problems(explain(plan, returned=0, examined=11)) == ["examined 11 documents for 0"]
+    assert plan_problems(explain(plan, returned=2, examined=21), max_ratio=20) == []
+
+
+def test_check_query_plans_reports_only_bad_plans():
+    plans = {name: INDEXED for name in USER_QUERIES}
+    plans["older_than"] = explain({"stage": "COLLSCAN"}, returned=3, examined=1000)
+    by_query = {repr(query): plans[name] for name, query in USER_QUERIES.items()}
+
+    flagged = check_query_plans(None, explain=lambda collection, query: by_query[repr(query)])
+
+    assert flagged == {"older_than": ["COLLSCAN", "examined 1000 documents for 3"]}
+
+
+def test_remove_duplicate_names_keeps_the_oldest_and_ignores_unnamed_users():
+    mongomock = pytest.importorskip("mongomock")
+    users = mongomock.MongoClient()["example_database"]["users"]
+    users.insert_many([{"_id": 1, "name": "John Doe"}, {"_id": 2, "name": "Jane Smith"},
+                       {"_id": 3, "name": "John Doe"}, {"_id": 4, "name": "John Doe"},
+                       {"_id": 5, "email": "a@example.com"}, {"_id": 6, "email": "b@example.com"}])
+
+    assert remove_duplicate_names(users) == 2
+    assert sorted(user["_id"] for user in users.find()) == [1, 2, 5, 6]
+    assert remove_duplicate_names(users) == 0
@@ -0,0 +1,150 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from harpreet.neo_ex import (DEMO_EXPORT, MOVIE_NETWORK, GraphDatabaseDemo, RatingRecommender, SchemaManager,
+                             export_query)
+
+
+@pytest.fixture(scope="module")
+def demo():
+    demo = GraphDatabaseDemo(backend="memory")
+    demo.create_social_network()
+    demo.create_movie_network()
+    yield demo
+    demo.close()
+
+
+def _movie_ratings():
+    _, _, _, rows = next(rel for rel in MOVIE_NETWORK["relationships"] if rel[0] == "RATED")
+    return [(user, title, properties["rating"]) for user, title, properties in rows]
+
+
+def test_friends_of_friends(demo):
+    assert demo.graph.friends_of_friends("Alice") == ["Charlie", "David", "Frank"]
+
+
+def test_shortest_path(demo):
+    assert demo.graph.shortest_path("Person", "Alice", "Person", "Frank") == ["Alice", "Emma", "Frank"]
+
+
+def test_lived_and_visited(demo):
+    assert demo.graph.lived_and_visited() == [
+        ("Alice", "New York City", ["San Francisco", "Los Angeles"]),
+        ("Bob", "New York City", ["Chicago"]),
+        ("Charlie", "San Francisco", ["New York City"]),
+        ("Emma", "Chicago", ["New York City", "San Francisco"]),
+        ("Frank", "Boston", ["Los Angeles"]),
+    ]
+
+
+def test_social_summary(demo):
+    assert demo.graph.social_summary() == [
+        ("Alice", 3, "New York City", 2),
+        ("Bob", 2, "New York City", 1),
+        ("Charlie", 2, "San Francisco", 1),
+        ("David", 1, "Los Angeles", 0),
+        ("Emma", 1, "Chicago", 2),
+        ("Frank", 1, "Boston", 1),
+        ("Grace", 0, "San Francisco", 0),
+    ]
+
+
+def test_incremental_ratings_match_full_rebuild():
+    ratings = _movie_ratings() + [("User1", "Inception", 1), ("User2", "The Matrix", 5), ("User6", "Inception", 2)]
+
+    incremental = RatingRecommender()
+    incremental.add_ratings(ratings[:10])
+    incremental.add_ratings(ratings[10:15])
+    incremental.add_ratings(ratings[15:])
+
+    full = RatingRecommender()
+    full.add_ratings(ratings)
+
+    assert incremental.users == full.users
+    assert incremental.movies == full.movies
+    np.testing.assert_allclose(incremental.matrix.toarray(), full.matrix.toarray())
+    np.testing.assert_allclose(incremental.gram.toarray(), full.gram.toarray())
+    assert incremental.recommend("User1") == full.recommend("User1")
+
+
+def test_add_ratings_replaces_existing_rating():
+    demo = GraphDatabaseDemo(backend="memory")
+    demo.create_movie_network()
+    rated = len(list(demo.graph.relationship_rows("RATED", "rating")))
+
+    demo.add_ratings([("User1", "Inception", 1), ("User2", "The Matrix", 5)])
+
+    ratings = list(demo.graph.relationship_rows("RATED", "rating"))
+    assert len(ratings) == rated + 1
+    assert [rating for user, title, rating in ratings if (user, title) == ("User1", "Inception")] == [1]
+    assert _movie_ratings()[0] == ("User1", "Inception", 5)
+
+
+def test_export_query_matches_labels_and_types_directly():
+    query = export_query(*DEMO_EXPORT)
+    assert "MATCH (n:Person|City)" in query
+    assert "MATCH (a:Person|City)-[r:FRIEND|LIVES_IN]->(b:Person|City)" in query
+    assert "$" not in query
+    with pytest.raises(ValueError):
+        export_query(["Person) DETACH DELETE (n"], [])
+
+
+class _ExplainOnly:
+    """Stands in for GraphDatabaseDemo, answering EXPLAIN with a canned plan per query"""
+
+    graph = None
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    def _session(self):
+        return self
+
+    def execute_write(self, function, query, params):
+        return [], SimpleNamespace(plan=self.plans[query.removeprefix("EXPLAIN ")])
+
+
+def _plan(*operators):
+    return {"operatorType": "ProduceResults@neo4j",
+            "children": [{"operatorType": f"{operator}@neo4j"} for operator in operators]}
+
+
+def test_check_plans_flags_whole_database_scans_even_when_label_scans_are_allowed():
+    queries = {"export_graph": "MATCH (n) RETURN n", "social_summary": "MATCH (p:Person) RETURN p",
+               "person_node": "MATCH (p:Person {name: 'Alice'}) RETURN p"}
+    schema = SchemaManager(_ExplainOnly({
+        queries["export_graph"]: _plan("AllNodesScan"),
+        queries["social_summary"]: _plan("NodeByLabelScan"),
+        queries["person_node"]: _plan("NodeUniqueIndexSeek"),
+    }))
+
+    assert schema.check_plans(queries) == {"export_graph": ["AllNodesScan@neo4j"]}
+
+
+def test_memory_relationships_match_on_the_requested_keys():
+    demo = GraphDatabaseDemo(backend="memory")
+    demo.load_nodes("Person", [{"name": "Carol", "email": "c@x"}, {"name": "Dan", "email": "d@x"}])
+
+    assert demo.load_relationships("FRIEND", "Person", "Person", [("c@x", "d@x")],
+                                   start_key="email", end_key="email")["count"] == 1
+    assert demo.load_relationships("FRIEND", "Person", "Person", [("Carol", "d@x")],
+                                   end_key="email")["count"] == 1
+    assert demo.load_relationships("FRIEND", "Person", "Person", [("Carol", "Dan")],
+                                   start_key="email", end_key="email")["count"] == 0
+    assert demo.graph.friends_of_friends("Carol") == []
+    assert list(demo.graph.relationship_rows("FRIEND", "since")) == [("Carol", "Dan", None)] * 2
+
+
+def test_csv_nodes_keep_integer_properties_and_drop_blanks(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("name,age,city\nAnn,41,Oslo\nBen,,Rome\nCat,7,\n")
+    demo = GraphDatabaseDemo(backend="memory")
+
+    demo.load_nodes_from_file("Person", path, batch_size=2)
+
+    assert demo.graph.properties == [{"name": "Ann", "age": 41, "city": "Oslo"},
+                                     {"name": "Ben", "city": "Rome"},
+                                     {"name": "Cat", "age": 7}]
+    assert all(type(node.get("age", 0)) is int for node in demo.graph.properties)
@@ -0,0 +1,109 @@
+import datetime
+
+import pytest
+
+from harpreet import rdbms_exe
+from harpreet.rdbms_exe import (FeedEntry, Message, Relationship, User, bulk_insert, bulk_load_users, create_tables,
+                                feed, post_message, rebuild_feeds, search_messages, use_database)
+
+START = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = use_database(str(tmp_path / "test.db"))
+    create_tables()
+    yield db
+    db.close()
+    use_database()
+
+
+@pytest.fixture
+def users(db):
+    users = {name: User.create(username=name, password="pw", email=f"{name}@example.com", join_date=START)
+             for name in ("alice", "bob", "carol", "dave")}
+    for follower, followed in [("alice", "bob"), ("alice", "carol"), ("dave", "bob")]:
+        Relationship.create(from_user=users[follower], to_user=users[followed])
+    return users
+
+
+def _all_pages(user, limit, materialized):
+    pages, cursor = [], None
+    while True:
+        messages, cursor = feed(user, limit=limit, cursor=cursor, materialized=materialized)
+        pages.append([message.content for message in messages])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("materialized", [False, True])
+def test_feed_pages_continue_where_the_last_one_stopped(users, materialized):
+    for i in range(7):
+        # Pairs of messages share a timestamp, so the id has to break the tie
+        post_message(users["bob" if i % 2 else "carol"], f"message {i}", START + datetime.timedelta(minutes=i // 2))
+    post_message(users["dave"], "not followed", START)
+
+    pages = _all_pages(users["alice"], 3, materialized)
+
+    assert pages == [["message 6", "message 5", "message 4"], ["message 3", "message 2", "message 1"],
+                     ["message 0"]]
+
+
+@pytest.mark.parametrize("materialized", [False, True])
+def test_feed_ends_with_an_empty_page_when_the_last_one_is_full(users, materialized):
+    for i in range(4):
+        post_message(users["bob"], f"message {i}", START + datetime.timedelta(minutes=i))
+
+    assert _all_pages(users["alice"], 2, materialized) == [["message 3", "message 2"], ["message 1", "message 0"], []]
+
+
+def test_post_message_fans_out_to_every_follower(users):
+    message = post_message(users["bob"], "hello followers")
+    post_message(users["bob"], "not fanned out", fan_out=False)
+
+    owners = {entry.owner.username for entry in FeedEntry.select().where(FeedEntry.message == message)}
+    assert owners == {"alice", "dave"}
+    assert FeedEntry.select().count() == 2
+
+    rebuild_feeds()
+    assert FeedEntry.select().count() == 4
+
+
+def test_bulk_insert_splits_statements_at_the_variable_limit(db, monkeypatch):
+    monkeypatch.setattr(rdbms_exe, "SQLITE_MAX_VARIABLES", 10)
+    statements = []
+    insert_many = User.insert_many
+    monkeypatch.setattr(User, "insert_many",
+                        lambda rows, fields=None: statements.append(len(rows)) or insert_many(rows, fields=fields))
+
+    result = bulk_load_users((f"user{i}", "pw", f"user{i}@example.com", START) for i in range(9))
+
+    assert statements == [2, 2, 2, 2, 1]  # 4 fields, so 2 rows per 10 variables
+    assert result["count"] == User.select().count() == 9
+
+
+def test_bulk_insert_fills_statements_up_to_sqlite_max_variables(db):
+    users = bulk_load_users((f"user{i}", "pw", f"user{i}@example.com", START) for i in range(2))
+    ids = [user.id for user in User.select()]
+    rows = [(ids[i % 2], f"message {i}", START) for i in range(rdbms_exe.SQLITE_MAX_VARIABLES // 3 + 1)]
+
+    assert users["count"] == 2
+    assert bulk_insert(Message, [Message.user, Message.content, Message.pub_date], rows)["count"] == len(rows)
+    assert Message.select().count() == len(rows)
+
+
+def test_search_follows_insert_update_and_delete(users):
+    first = post_message(users["bob"], "walking the dogs in the park")
+    post_message(users["carol"], "a quiet evening reading")
+
+    found = search_messages("dog")
+    assert [message.id for message in found] == [first.id]
+    assert "[dogs]" in found[0].snippet
+
+    Message.update(content="cycling to the coast").where(Message.id == first.id).execute()
+    assert search_messages("dog") == []
+    assert [message.id for message in search_messages("cycle")] == [first.id]
+
+    Message.delete().where(Message.id == first.id).execute()
+    assert search_messages("cycle") == []
+    assert [message.content for message in search_messages("reading")] == ["a quiet evening reading"]